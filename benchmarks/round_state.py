@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark of engine.RoundState against the namedtuple implementation it replaced.
+
+Both implementations play the same simulated hands with the same random
+action choices, and the benchmark checks that they agree on every payoff.
+
+Usage:
+    python benchmarks/round_state.py [--hands N] [--seed N]
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import pkrbot
+from dealing import PresetDeck
+from engine import (RoundState, TerminalState, DiscardAction, FoldAction, CallAction, CheckAction,
+                    RaiseAction, STARTING_STACK, BIG_BLIND, SMALL_BLIND)
+
+DEAL_POOL_SIZE = 1000
+
+
+class LegacyRoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'deck', 'board', 'previous_state'])):
+    """
+    The engine's RoundState before it was made slotted and updated in place.
+    """
+
+    def get_delta(self, winner_index):
+        if winner_index == 2:
+            delta = 0
+        elif winner_index == 0:
+            delta = STARTING_STACK - self.stacks[1]
+        else:
+            delta = self.stacks[0] - STARTING_STACK
+        if abs(delta - math.floor(delta)) > 1e-6:
+            delta = math.floor(delta) if self.button % 2 == 0 else math.ceil(delta)
+        return int(delta)
+
+    def showdown(self):
+        score0 = pkrbot.evaluate(self.board + self.hands[0])
+        score1 = pkrbot.evaluate(self.board + self.hands[1])
+        delta = self.get_delta(0 if score0 > score1 else (1 if score0 < score1 else 2))
+        return TerminalState([int(delta), -int(delta)], self)
+
+    legal_actions = RoundState.legal_actions
+    raise_bounds = RoundState.raise_bounds
+
+    def proceed_street(self):
+        if self.street == 6:
+            return self.showdown()
+        elif self.street == 0:
+            new_street = 2
+            button = 1
+            self.board.extend(self.deck.peek(new_street))
+        elif self.street == 2:
+            new_street = 3
+            button = 0
+        elif self.street == 3:
+            new_street = 4
+            button = 1
+        else:
+            new_street = self.street + 1
+            button = 1
+            self.board.append(self.deck.peek(new_street - 1)[new_street - 2])
+        return LegacyRoundState(button, new_street, [0, 0], self.stacks, self.hands, self.deck, self.board, self)
+
+    def proceed(self, action):
+        active = self.button % 2
+        if isinstance(action, DiscardAction):
+            if len(self.hands[active]) != 0:
+                self.board.append(self.hands[active].pop(action.card))
+            return LegacyRoundState((1 - active) % 2, self.street, self.pips, self.stacks, self.hands, self.deck, self.board, self)
+        if isinstance(action, FoldAction):
+            delta = self.get_delta((1 - active) % 2)
+            return TerminalState([delta, -delta], self)
+        if isinstance(action, CallAction):
+            if self.button == 0:
+                return LegacyRoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.deck, self.board, self)
+            new_pips = list(self.pips)
+            new_stacks = list(self.stacks)
+            contribution = new_pips[1-active] - new_pips[active]
+            new_stacks[active] -= contribution
+            new_pips[active] += contribution
+            state = LegacyRoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board, self)
+            return state.proceed_street()
+        if isinstance(action, CheckAction):
+            if (self.street == 0 and self.button > 0) or self.button > 1 or self.street == 2 or self.street == 3:
+                return self.proceed_street()
+            return LegacyRoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.board, self)
+        new_pips = list(self.pips)
+        new_stacks = list(self.stacks)
+        contribution = action.amount - new_pips[active]
+        new_stacks[active] -= contribution
+        new_pips[active] += contribution
+        return LegacyRoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board, self)
+
+
+def make_deals(count: int, rng: random.Random) -> list:
+    """
+    Pre-shuffles deals so that dealing does not count towards the benchmark.
+
+    Returns:
+        List of (hands, deck) pairs in the layout Game.run_round uses
+    """
+    cards = pkrbot.Deck().cards
+    deals = []
+    for _ in range(count):
+        order = list(cards)
+        rng.shuffle(order)
+        deals.append(([order[0:3], order[3:6]], PresetDeck(order[6:])))
+    return deals
+
+
+def play(state_class, num_hands: int, seed: int) -> Tuple[float, int, int]:
+    """
+    Plays num_hands hands with uniformly random legal actions.
+
+    Returns:
+        Elapsed seconds, number of actions taken, and the sum of player 0's payoffs
+    """
+    rng = random.Random(seed)
+    deals = make_deals(DEAL_POOL_SIZE, rng)
+    order = sorted([DiscardAction, FoldAction, CallAction, CheckAction, RaiseAction], key=lambda action: action.__name__)
+    extra = (None,) if state_class is LegacyRoundState else ()
+    actions = 0
+    total = 0
+    start = time.perf_counter()
+    for hand in range(num_hands):
+        hands, deck = deals[hand % DEAL_POOL_SIZE]
+        state = state_class(0, 0, [SMALL_BLIND, BIG_BLIND], [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND],
+                            [list(hands[0]), list(hands[1])], deck, [], *extra)
+        while not isinstance(state, TerminalState):
+            legal = state.legal_actions()
+            choice = [action for action in order if action in legal][rng.randrange(len(legal))]
+            if choice is RaiseAction:
+                min_raise, max_raise = state.raise_bounds()
+                action = RaiseAction(rng.randint(min_raise, max_raise))
+            elif choice is DiscardAction:
+                action = DiscardAction(rng.randrange(3))
+            else:
+                action = choice()
+            state = state.proceed(action)
+            actions += 1
+        total += state.deltas[0]
+    return time.perf_counter() - start, actions, total
+
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hands', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    for state_class in (LegacyRoundState, RoundState):
+        elapsed, actions, total = play(state_class, args.hands, args.seed)
+        results[state_class.__name__] = (elapsed, total)
+        print(f"{state_class.__name__:>16}: {elapsed:7.2f} s, {args.hands / elapsed:9.0f} hands/s, "
+              f"{1e6 * elapsed / actions:.2f} us/action")
+    assert results['LegacyRoundState'][1] == results['RoundState'][1], "implementations disagree on payoffs"
+    print(f"Speedup: {results['LegacyRoundState'][0] / results['RoundState'][0]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the game's hot paths.
+
+Each case times one operation over a fixed, seeded workload, repeats the
+measurement and keeps the best and median times, so results are comparable
+between runs on the same machine. Results can be written as JSON, stored as
+a baseline, and later runs compared against it.
+
+Usage:
+    python benchmarks/suite.py [--cases NAME ...] [--repeat N] [--quick]
+                               [--json results.json] [--save-baseline baseline.json]
+                               [--compare baseline.json] [--tolerance 1.2]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import pkrbot
+import engine
+from dealing import DealStream
+from engine import (RoundState, TerminalState, DiscardAction, FoldAction, CallAction, CheckAction, RaiseAction,
+                    STARTING_STACK, BIG_BLIND, SMALL_BLIND)
+
+NUM_HANDS = 20000
+NUM_STATES = 20000
+NUM_QUERIES = 2000
+NUM_ROUNDS = 1000
+SEED = 0
+
+
+def new_round(deck) -> RoundState:
+    """Starts a round on deck the way Game.run_round does."""
+    hands = [deck.deal(3), deck.deal(3)]
+    return RoundState(0, 0, [SMALL_BLIND, BIG_BLIND], [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND],
+                      hands, deck, [])
+
+
+def random_action(state: RoundState, rng: random.Random):
+    """Picks a uniformly random legal action."""
+    legal = state.legal_actions()
+    choice = rng.choice([action for action in (DiscardAction, FoldAction, CallAction, CheckAction, RaiseAction)
+                         if action in legal])
+    if choice is RaiseAction:
+        min_raise, max_raise = state.raise_bounds()
+        return RaiseAction(rng.randint(min_raise, max_raise))
+    if choice is DiscardAction:
+        return DiscardAction(rng.randrange(3))
+    return choice()
+
+
+def random_playouts(num_hands: int, seed: int) -> list:
+    """
+    Plays random hands, recording the action sequences so they can be
+    replayed without the cost of choosing actions.
+
+    Returns:
+        List of (deck cards, actions) pairs
+    """
+    rng = random.Random(seed)
+    deals = DealStream(seed)
+    playouts = []
+    for _ in range(num_hands):
+        deck = deals.next_deck()
+        cards = list(deck.cards)
+        state = new_round(deck)
+        actions = []
+        while not isinstance(state, TerminalState):
+            action = random_action(state, rng)
+            actions.append(action)
+            state = state.proceed(action)
+        playouts.append((cards, actions))
+    return playouts
+
+
+def sampled_states(num_states: int, seed: int) -> list:
+    """Snapshots random non-terminal states of random hands."""
+    rng = random.Random(seed)
+    deals = DealStream(seed)
+    states = []
+    while len(states) < num_states:
+        state = new_round(deals.next_deck())
+        while not isinstance(state, TerminalState):
+            if rng.random() < 0.3:
+                states.append(state.copy())
+            state = state.proceed(random_action(state, rng))
+    return states[:num_states]
+
+
+def river_states(num_states: int, seed: int) -> list:
+    """Builds states at the river, ready for showdown."""
+    deals = DealStream(seed)
+    states = []
+    for _ in range(num_states):
+        deck = deals.next_deck()
+        state = new_round(deck)
+        state.street = 6
+        state.pips = [0, 0]
+        state.stacks = [STARTING_STACK - BIG_BLIND] * 2
+        state.board = deck.peek(6)  # flop, two discards, turn and river
+        state.hands = [state.hands[0][:2], state.hands[1][:2]]
+        states.append(state)
+    return states
+
+
+def case_proceed(quick: bool):
+    """RoundState.proceed over recorded random playouts, per action."""
+    from dealing import PresetDeck
+    playouts = random_playouts(NUM_HANDS // (10 if quick else 1), SEED)
+    decks = [PresetDeck(cards) for cards, _ in playouts]
+    num_actions = sum(len(actions) for _, actions in playouts)
+
+    def run():
+        for (cards, actions), deck in zip(playouts, decks):
+            deck.cards[:] = cards
+            state = new_round(deck)
+            for action in actions:
+                state = state.proceed(action)
+    return run, num_actions
+
+
+def case_legal_actions(quick: bool):
+    """RoundState.legal_actions on sampled states."""
+    states = sampled_states(NUM_STATES // (10 if quick else 1), SEED)
+
+    def run():
+        for state in states:
+            state.legal_actions()
+    return run, len(states)
+
+
+def case_raise_bounds(quick: bool):
+    """RoundState.raise_bounds on sampled states."""
+    states = sampled_states(NUM_STATES // (10 if quick else 1), SEED)
+
+    def run():
+        for state in states:
+            state.raise_bounds()
+    return run, len(states)
+
+
+def case_showdown(quick: bool):
+    """RoundState.showdown, two pkrbot.evaluate calls each."""
+    states = river_states(NUM_STATES // (10 if quick else 1), SEED)
+
+    def run():
+        for state in states:
+            state.showdown()
+    return run, len(states)
+
+
+def case_query_round_trip(quick: bool):
+    """Player.query to the python_skeleton bot over its socket, per query."""
+    player = engine.Player('bench', str(ROOT / 'python_skeleton'), tempfile.gettempdir())
+    player.build()
+    player.run(verbose=False)
+    state = sampled_states(1, SEED)[0]
+    num_queries = NUM_QUERIES // (10 if quick else 1)
+    message = ['T0.', 'P0', 'H' + engine.CCARDS(state.hands[0]), 'G']
+    log = []
+
+    def run():
+        for _ in range(num_queries):
+            player.game_clock = 1e9
+            player.query(state, list(message), log)
+    return run, num_queries, player.stop
+
+
+def case_runner_parse(quick: bool):
+    """Runner.run over a synthetic game's messages to python_skeleton, per message."""
+    from mock_engine import MessageFeed, synthetic_stream
+    from replay import load_bot
+    messages = synthetic_stream(NUM_ROUNDS // (10 if quick else 1), SEED)
+    pokerbot, runner = load_bot(ROOT / 'python_skeleton')
+
+    def run():
+        runner.Runner(pokerbot, MessageFeed(messages)).run()
+    return run, len(messages)
+
+
+def python_v2():
+    """Imports python_v2's player module."""
+    from replay import load_bot
+    pokerbot, _ = load_bot(ROOT / 'python_v2')
+    return sys.modules[type(pokerbot).__module__]
+
+
+def case_eval_discard(quick: bool):
+    """python_v2 toss_logic.eval_discard on random hands and flops."""
+    player = python_v2()
+    rng = random.Random(SEED)
+    cards = [str(card) for card in pkrbot.Deck().cards]
+    inputs = []
+    for _ in range(NUM_STATES // (10 if quick else 1)):
+        dealt = rng.sample(cards, 5 + rng.randrange(2))
+        inputs.append((dealt[:3], dealt[3:]))
+
+    def run():
+        for hand, board in inputs:
+            player.eval_discard(hand, board)
+    return run, len(inputs)
+
+
+def case_score_pair(quick: bool):
+    """python_v2 Player.score_pair on random pairs of cards."""
+    player = python_v2()
+    rng = random.Random(SEED)
+    cards = [str(card) for card in pkrbot.Deck().cards]
+    pairs = [tuple(rng.sample(cards, 2)) for _ in range(NUM_STATES // (10 if quick else 1))]
+    score_pair = player.Player.score_pair
+
+    def run():
+        for a, b in pairs:
+            score_pair(a, b)
+    return run, len(pairs)
+
+
+def case_full_game(quick: bool):
+    """A whole engine game between the bots in config.py, per round."""
+    log_dir = tempfile.mkdtemp()
+    num_rounds = engine.NUM_ROUNDS
+
+    def run():
+        engine.Game(log_dir, SEED).run(verbose=False)
+    return run, num_rounds, lambda: shutil.rmtree(log_dir)
+
+
+CASES = {
+    'proceed': case_proceed,
+    'legal_actions': case_legal_actions,
+    'raise_bounds': case_raise_bounds,
+    'showdown': case_showdown,
+    'query_round_trip': case_query_round_trip,
+    'runner_parse': case_runner_parse,
+    'eval_discard': case_eval_discard,
+    'score_pair': case_score_pair,
+    'full_game': case_full_game,
+}
+SLOW_CASES = {'full_game'}
+
+
+def measure(name: str, repeat: int, quick: bool) -> dict:
+    """
+    Sets up one case and times it repeat times.
+
+    Returns:
+        Dictionary of the operation count and the best and median times
+    """
+    setup = CASES[name](quick)
+    run, ops = setup[:2]
+    teardown = setup[2] if len(setup) > 2 else None
+    times = []
+    try:
+        for _ in range(1 if name in SLOW_CASES else repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    finally:
+        if teardown is not None:
+            teardown()
+    best = min(times)
+    median = statistics.median(times)
+    return {
+        'ops': ops,
+        'best_s': best,
+        'median_s': median,
+        'best_us_per_op': 1e6 * best / ops,
+        'median_us_per_op': 1e6 * median / ops,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Prints each case's median time per op against the baseline.
+
+    Returns:
+        Names of the cases slower than tolerance times their baseline
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline.get('cases', {}):
+            print(f"{name:>17}: no baseline")
+            continue
+        before = baseline['cases'][name]['median_us_per_op']
+        ratio = result['median_us_per_op'] / before
+        flag = ''
+        if ratio > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:>17}: {before:10.3f} -> {result['median_us_per_op']:10.3f} us/op ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (slow cases run once)')
+    parser.add_argument('--quick', action='store_true', help='use a tenth of the workload and skip slow cases')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--save-baseline', help='store the results as a baseline at this path')
+    parser.add_argument('--compare', help='compare against the baseline at this path')
+    parser.add_argument('--tolerance', type=float, default=1.2,
+                        help='median slowdown over the baseline that counts as a regression')
+    args = parser.parse_args()
+
+    # the full game writes its logs under a temporary directory, but bots are found relative to the repo
+    os.chdir(ROOT)
+    results = {}
+    for name in args.cases:
+        if args.quick and name in SLOW_CASES:
+            continue
+        results[name] = measure(name, args.repeat, args.quick)
+        print(f"{name:>17}: {results[name]['median_us_per_op']:10.3f} us/op median, "
+              f"{results[name]['best_us_per_op']:10.3f} us/op best ({results[name]['ops']} ops)")
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'quick': args.quick,
+        'cases': results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path is not None:
+            with open(path, 'w') as json_file:
+                json.dump(report, json_file, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as json_file:
+            baseline = json.load(json_file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            sys.exit(f"Regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,25 @@ ENFORCE_GAME_CLOCK = True
 STARTING_GAME_CLOCK = 60.0
 BUILD_TIMEOUT = 10.0
 CONNECT_TIMEOUT = 10.0
+# GAME_CLOCK_MODE IS 'wall' (ELAPSED TIME PER QUERY) OR 'cpu' (BOT PROCESS CPU TIME PER QUERY, LINUX ONLY)
+# IN 'cpu' MODE THE BOT'S RUN COMMAND SHOULD exec THE BOT (SEE cpp_skeleton/run.sh): THE CLOCK COUNTS THE
+# PROCESS AND ITS LIVE DESCENDANTS, BUT NOT THE TIME OF CHILDREN THAT HAVE ALREADY EXITED
+GAME_CLOCK_MODE = 'wall'
+# PER-BOT CPU TIME, PEAK RSS, CONTEXT SWITCHES AND PAGE FAULTS ARE WRITTEN TO <NAME>_usage.json
+RECORD_BOT_USAGE = True
+# PER-BOT RESOURCE LIMITS, None FOR UNLIMITED. A BOT THAT HITS ONE FORFEITS THE REST OF THE GAME
+# BOT_MEMORY_LIMIT IS ADDRESS SPACE IN BYTES, BOT_CPU_TIME_LIMIT IS IN SECONDS
+BOT_MEMORY_LIMIT = None
+BOT_CPU_TIME_LIMIT = None
+BOT_OPEN_FILES_LIMIT = None
+# SET BOT_PROFILE TO 'cprofile' OR 'sampling' TO PROFILE PYTHON BOTS; A "profile" ENTRY IN A BOT'S
+# commands.json OVERRIDES IT FOR THAT BOT. PROFILES ARE WRITTEN NEXT TO <NAME>.txt
+BOT_PROFILE = None
+BOT_PROFILE_INTERVAL = 0.001
+# SET BOT_TRACE = True (OR "trace": true IN A BOT'S commands.json) TO TRACE EVERY DECISION OF PYTHON BOTS
+# TO <NAME>.trace; DECISIONS SLOWER THAN BOT_TRACE_ALLOC_THRESHOLD SECONDS ALSO GET ALLOCATION SITES
+BOT_TRACE = False
+BOT_TRACE_ALLOC_THRESHOLD = None
 # THE GAME VARIANT FIXES THE PARAMETERS BELOW
 # CHANGE ONLY FOR TRAINING OR EXPERIMENTATION
 NUM_ROUNDS = 1000
@@ -24,4 +43,16 @@ SMALL_BLIND = 1
 
 PLAYER_TIMEOUT = 120
 
-NUM_GAMES = 100
\ No newline at end of file
+NUM_GAMES = 100
+# SET DEAL_SEED TO AN INTEGER TO MAKE THE DEALS REPRODUCIBLE; EACH GAME LOGS ITS SEED
+DEAL_SEED = None
+# SET WINNINGS_PLOT_FILENAME (E.G. "winnings.png") TO SAVE THE WINNINGS PLOT INSTEAD OF SHOWING IT
+# THE PLOT IS ALSO SAVED, TO winnings.png, WHEN NO DISPLAY IS AVAILABLE
+WINNINGS_PLOT_FILENAME = None
+# PARALLEL TOURNAMENTS (tournament.py) PIN EACH WORKER AND ITS BOTS TO THEIR OWN CORES
+# TOURNAMENT_WORKERS = 0 MEANS ONE WORKER PER PHYSICAL CORE; MORE ARE CAPPED TO THAT
+TOURNAMENT_WORKERS = 0
+TOURNAMENT_NICENESS = 0
+TOURNAMENT_LOG_DIR = "tournament_logs"
+# SET METRICS_PORT (E.G. 9100) TO SERVE THROUGHPUT METRICS AT http://127.0.0.1:<PORT>/metrics
+METRICS_PORT = None
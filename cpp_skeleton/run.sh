@@ -1,3 +1,4 @@
 #!/bin/bash
 
-./build/pokerbot "$@"
+# exec so the engine accounts the pokerbot itself, not an idle shell
+exec ./build/pokerbot "$@"
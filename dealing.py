@@ -0,0 +1,85 @@
+'''
+Reproducible, batched deck dealing for the engine and the simulators.
+
+DealStream shuffles decks a block at a time, argsorting random keys into an
+(N, 52) uint8 array of card indices (4 * rank + suit, pkrbot's deck order),
+from a seed that is recorded in the game log. The same seed always deals
+the same sequence of rounds, so any game can be replayed from its seed.
+'''
+import numpy as np
+import pkrbot
+
+CARDS = pkrbot.Deck().cards  # an unshuffled deck is in card index order
+DEAL_BLOCK_SIZE = 1000
+
+
+def new_seed():
+    '''
+    Returns a fresh random seed.
+    '''
+    return int(np.random.SeedSequence().entropy)
+
+
+def game_seeds(seed, num_games):
+    '''
+    Derives independent per-game seeds from one tournament seed.
+    '''
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(num_games)]
+
+
+def shuffled_decks(rng, num_decks):
+    '''
+    Returns a (num_decks, 52) uint8 array of independently shuffled decks.
+    '''
+    return np.argsort(rng.random((num_decks, 52)), axis=1).astype(np.uint8)
+
+
+class DealStream():
+    '''
+    An endless, seeded stream of shuffled decks, generated in blocks.
+    '''
+
+    def __init__(self, seed=None, block_size=DEAL_BLOCK_SIZE):
+        self.seed = new_seed() if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        self.block_size = block_size
+        self.block = shuffled_decks(self.rng, block_size)
+        self.position = 0
+
+    def next_block(self, num_decks):
+        '''
+        Returns the next num_decks decks as a (num_decks, 52) uint8 array.
+        '''
+        blocks = []
+        while num_decks > 0:
+            if self.position == len(self.block):
+                self.block = shuffled_decks(self.rng, self.block_size)
+                self.position = 0
+            count = min(num_decks, len(self.block) - self.position)
+            blocks.append(self.block[self.position:self.position + count])
+            self.position += count
+            num_decks -= count
+        return np.concatenate(blocks)
+
+    def next_deck(self):
+        '''
+        Returns the next deck as a PresetDeck of pkrbot cards.
+        '''
+        return PresetDeck([CARDS[card] for card in self.next_block(1)[0].tolist()])
+
+
+class PresetDeck():
+    '''
+    The parts of pkrbot.Deck used by the engine, over a fixed card order.
+    '''
+
+    def __init__(self, cards):
+        self.cards = list(cards)
+
+    def deal(self, n):
+        dealt = self.cards[:n]
+        del self.cards[:n]
+        return dealt
+
+    def peek(self, n):
+        return self.cards[:n]
@@ -15,11 +15,11 @@ import sys
 import os
 import random
 
-import matplotlib.pyplot as plt
-import numpy as np
-
 sys.path.append(os.getcwd())
 from config import *
+from resource_usage import BotUsage, bot_limits, exit_reason
+from metrics import METRICS, start_server
+from reporting import plot_winnings
 ###New action for discarding a card from your hand and adding it to the board
 DiscardAction = namedtuple('DiscardAction', ['card'])
 
@@ -60,10 +60,32 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # Action history is sent once, including the player's actions
 
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'deck', 'board', 'previous_state'])):
+class RoundState():
     '''
     Encodes the game tree for one round of poker.
+
+    A round is played on a single RoundState which proceed() updates in place,
+    so advancing the game allocates nothing per action. The only history kept
+    is what log_terminal_state needs: the TerminalState points back at the
+    final RoundState. Use copy() to keep a snapshot of an intermediate state.
     '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'hands', 'deck', 'board')
+
+    def __init__(self, button, street, pips, stacks, hands, deck, board):
+        self.button = button
+        self.street = street
+        self.pips = pips
+        self.stacks = stacks
+        self.hands = hands
+        self.deck = deck
+        self.board = board
+
+    def copy(self):
+        '''
+        Returns an independent snapshot of this state (sharing only the deck).
+        '''
+        return RoundState(self.button, self.street, list(self.pips), list(self.stacks),
+                          [list(self.hands[0]), list(self.hands[1])], self.deck, list(self.board))
 
     def get_delta(self, winner_index: int) -> int:
         '''Returns the delta for player A and -delta for player B.
@@ -175,7 +197,10 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             button = 1
             self.board.append(self.deck.peek(new_street - 1)[new_street - 2])
 
-        return RoundState(button, new_street, [0, 0], self.stacks, self.hands, self.deck, self.board, self)
+        self.button = button
+        self.street = new_street
+        self.pips[0] = self.pips[1] = 0
+        return self
 
     def proceed(self, action):
         '''
@@ -191,7 +216,7 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
 
         Returns:
             Either:
-            - RoundState: The new state after the action is performed
+            - RoundState: This state, updated in place to reflect the action
             - TerminalState: If the action ends the hand (e.g., fold or final call)
 
         Note:
@@ -206,34 +231,35 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         if isinstance(action, DiscardAction):
             if len(self.hands[active]) != 0:
                 self.board.append(self.hands[active].pop(action.card))
-            state = RoundState((1 - active) % 2, self.street, self.pips, self.stacks, self.hands, self.deck, self.board, self)
-            return state
+            self.button = (1 - active) % 2
+            return self
         if isinstance(action, FoldAction):
             delta = self.get_delta((1 - active) % 2) # if active folds, the other player (1 - active) wins
             return TerminalState([delta, -delta], self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.deck, self.board,self)
+                self.button = 1
+                self.pips[0] = self.pips[1] = BIG_BLIND
+                self.stacks[0] = self.stacks[1] = STARTING_STACK - BIG_BLIND
+                return self
             # both players acted
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board, self)
-            return state.proceed_street()
+            contribution = self.pips[1-active] - self.pips[active]
+            self.stacks[active] -= contribution
+            self.pips[active] += contribution
+            self.button += 1
+            return self.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1 or self.street == 2 or self.street == 3:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.board, self)
+            self.button += 1
+            return self
         # isinstance(action, RaiseAction)
-        new_pips = list(self.pips)
-        new_stacks = list(self.stacks)
-        contribution = action.amount - new_pips[active]
-        new_stacks[active] -= contribution
-        new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board, self)
+        contribution = action.amount - self.pips[active]
+        self.stacks[active] -= contribution
+        self.pips[active] += contribution
+        self.button += 1
+        return self
 
 
 class Player():
@@ -241,15 +267,17 @@ class Player():
     Handles subprocess and socket interactions with one player's pokerbot.
     '''
 
-    def __init__(self, name, path):
+    def __init__(self, name, path, log_dir='.'):
         self.name = name
         self.path = path
+        self.log_dir = log_dir
         self.game_clock = STARTING_GAME_CLOCK
         self.bankroll = 0
         self.commands = None
         self.bot_subprocess = None
         self.socketfile = None
         self.bytes_queue = Queue()
+        self.usage = None
 
     def build(self):
         '''
@@ -284,6 +312,27 @@ class Player():
             except OSError:
                 print(self.name, 'build failed - check "build" in commands.json')
 
+    def environment(self):
+        '''
+        Returns the environment to run the pokerbot in, or None to inherit the engine's.
+
+        Profiling and decision tracing are requested from the Python skeleton
+        through environment variables.
+        '''
+        prefix = os.path.abspath(os.path.join(self.log_dir, self.name))
+        variables = {}
+        profile = self.commands.get('profile', BOT_PROFILE)
+        if profile in ('cprofile', 'sampling'):
+            variables.update(POKERBOT_PROFILE=profile, POKERBOT_PROFILE_PATH=prefix,
+                             POKERBOT_PROFILE_INTERVAL=str(BOT_PROFILE_INTERVAL))
+        elif profile is not None:
+            print(self.name, 'unknown profile mode', profile, '- expected "cprofile" or "sampling"')
+        if self.commands.get('trace', BOT_TRACE):
+            variables['POKERBOT_TRACE_PATH'] = prefix + '.trace'
+            if BOT_TRACE_ALLOC_THRESHOLD is not None:
+                variables['POKERBOT_TRACE_ALLOC_THRESHOLD'] = str(BOT_TRACE_ALLOC_THRESHOLD)
+        return dict(os.environ, **variables) if variables else None
+
     def run(self, verbose=True):
         '''
         Runs the pokerbot and establishes the socket connection.
@@ -298,8 +347,11 @@ class Player():
                     port = server_socket.getsockname()[1]
                     proc = subprocess.Popen(self.commands['run'] + [str(port)],
                                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                            cwd=self.path)
+                                            cwd=self.path, env=self.environment(),
+                                            preexec_fn=bot_limits(BOT_MEMORY_LIMIT, BOT_CPU_TIME_LIMIT,
+                                                                  BOT_OPEN_FILES_LIMIT))
                     self.bot_subprocess = proc
+                    self.usage = BotUsage(proc.pid)
                     # function for bot listening
                     def enqueue_output(out, queue):
                         try:
@@ -330,6 +382,17 @@ class Player():
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to connect')
 
+    def exit_reason(self):
+        '''
+        Returns why the pokerbot died if it was stopped by one of its resource limits, else None.
+        '''
+        if self.bot_subprocess is None:
+            return None
+        # give the dying process a moment to be reaped
+        self.usage.reap(self.bot_subprocess, CONNECT_TIMEOUT / 10)
+        output = b''.join(line for line in list(self.bytes_queue.queue)[-50:] if isinstance(line, bytes))
+        return exit_reason(self.bot_subprocess.returncode, output, BOT_MEMORY_LIMIT, BOT_CPU_TIME_LIMIT, BOT_OPEN_FILES_LIMIT)
+
     def stop(self):
         '''
         Closes the socket connection and stops the pokerbot.
@@ -343,18 +406,20 @@ class Player():
             except OSError:
                 print('Could not close socket connection with', self.name)
         if self.bot_subprocess is not None:
+            timeout = PLAYER_TIMEOUT if self.path == r"./player_chatbot" else CONNECT_TIMEOUT
+            # reap with os.wait4 first so the bot's rusage is not lost to communicate()
+            self.usage.sample()
+            self.usage.reap(self.bot_subprocess, timeout)
             try:
-                if self.path == r"./player_chatbot":
-                    outs, _ = self.bot_subprocess.communicate(timeout=PLAYER_TIMEOUT)
-                else:
-                    outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
+                outs, _ = self.bot_subprocess.communicate(timeout=timeout)
                 self.bytes_queue.put(outs)
             except subprocess.TimeoutExpired:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
+                self.usage.reap(self.bot_subprocess, None)
                 outs, _ = self.bot_subprocess.communicate()
                 self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
+        with open(os.path.join(self.log_dir, self.name + '.txt'), 'wb') as log_file:
             bytes_written = 0
             for output in self.bytes_queue.queue:
                 try:
@@ -363,6 +428,8 @@ class Player():
                         break
                 except TypeError:
                     pass
+        if RECORD_BOT_USAGE and self.usage is not None:
+            self.usage.write(os.path.join(self.log_dir, self.name + '_usage.json'))
 
     def query(self, round_state, player_message, game_log):
         '''
@@ -385,7 +452,8 @@ class Player():
                 - FoldAction if check is not legal
 
         Notes:
-            - The game clock is decremented by the time taken to receive a response
+            - The game clock is decremented by the time taken to receive a response, or by
+              the CPU time the bot process used meanwhile when GAME_CLOCK_MODE is 'cpu'
             - Invalid or illegal actions are logged but not executed
             - Bot disconnections or timeouts result in game clock being set to 0
             - At the end of a round, only CheckAction is considered legal
@@ -397,13 +465,25 @@ class Player():
                 player_message[0] = 'T{:.3f}'.format(self.game_clock)
                 message = ' '.join(player_message) + '\n'
                 del player_message[1:]  # do not send redundant action history
+                # reading /proc costs tens of microseconds, so only when the clock needs it
+                start_cpu = self.usage.cpu_time() if GAME_CLOCK_MODE == 'cpu' else None
                 start_time = time.perf_counter()
                 self.socketfile.write(message)
                 self.socketfile.flush()
-                clause = self.socketfile.readline().strip()
+                line = self.socketfile.readline()
                 end_time = time.perf_counter()
+                if not line:
+                    raise ConnectionResetError  # the bot closed the socket or died
+                clause = line.strip()
+                end_cpu = self.usage.cpu_time() if start_cpu is not None else None
+                cpu_time = end_cpu - start_cpu if end_cpu is not None else None
+                self.usage.record_query(end_time - start_time, cpu_time)
+                METRICS.record_query(self.name, end_time - start_time)
                 if ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
-                    self.game_clock -= end_time - start_time
+                    if GAME_CLOCK_MODE == 'cpu' and cpu_time is not None:
+                        self.game_clock -= cpu_time
+                    else:
+                        self.game_clock -= end_time - start_time
                 if self.game_clock <= 0.:
                     raise socket.timeout
                 action = DECODE[clause[0]]
@@ -413,12 +493,14 @@ class Player():
                         min_raise, max_raise = round_state.raise_bounds()
                         if min_raise <= amount <= max_raise:
                             return action(amount)
+                        METRICS.record_illegal_action(self.name)
                     elif clause[0] == 'D':
                         card = int(clause[1:])
                         if 0 <= card <= 2:
                             return action(card)
                         else:
                             game_log.append(f"{self.name} attempted to discard invalid index {card}")
+                            METRICS.record_illegal_action(self.name)
                             # Invalid index - fall through to default action handling
                         ###### index the player's hand 'D0', 'D1', or 'D2' ######
                     else:
@@ -427,18 +509,25 @@ class Player():
                     # Action is not in legal_actions
                     game_log.append(f"street = {round_state.street}")
                     game_log.append(self.name + ' attempted illegal ' + action.__name__)
+                    METRICS.record_illegal_action(self.name)
             except socket.timeout:
                 error_message = self.name + ' ran out of time'
                 game_log.append(error_message)
+                METRICS.record_timeout(self.name)
                 print(error_message)
                 self.game_clock = 0.
             except OSError:
-                error_message = self.name + ' disconnected'
+                reason = self.exit_reason()
+                if reason is not None:
+                    error_message = self.name + ' ' + reason + ', forfeiting the rest of the game'
+                else:
+                    error_message = self.name + ' disconnected'
                 game_log.append(error_message)
                 print(error_message)
                 self.game_clock = 0.
             except (IndexError, KeyError, ValueError):
                 game_log.append(self.name + ' response misformatted: ' + str(clause))
+                METRICS.record_illegal_action(self.name)
         return CheckAction() if CheckAction in legal_actions else FoldAction()
 
 
@@ -447,7 +536,10 @@ class Game():
     Manages logging and the high-level game procedure.
     '''
 
-    def __init__(self):
+    def __init__(self, log_dir='.', seed=DEAL_SEED):
+        self.log_dir = log_dir
+        self.seed = seed
+        self.deals = None
         self.log = ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
         self.player_messages = [[], []]
         self.preflop_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
@@ -457,6 +549,15 @@ class Game():
         self.ev_flop_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
         self.ev_turn_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
 
+    def seat(self, players):
+        '''
+        Keys the per-player betting statistics by the names of players.
+        '''
+        for bets in (self.preflop_bets, self.flop_bets, self.turn_bets,
+                     self.ev_preflop_bets, self.ev_flop_bets, self.ev_turn_bets):
+            for player in players:
+                bets.setdefault(player.name, 0)
+
     def log_round_state(self, players, round_state):
         '''
         Incorporates RoundState information into the game log and player messages.
@@ -531,13 +632,12 @@ class Game():
         '''
         Runs one round of poker.
         '''
-        deck = pkrbot.Deck()
-        deck.shuffle()
+        deck = self.deals.next_deck()
         hands = [deck.deal(3), deck.deal(3)]
         board = []
         pips = [SMALL_BLIND, BIG_BLIND]
         stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-        round_state = RoundState(0, 0, pips, stacks, hands, deck, board, None)
+        round_state = RoundState(0, 0, pips, stacks, hands, deck, board)
         while not isinstance(round_state, TerminalState):
             self.log_round_state(players, round_state)
             active = round_state.button % 2
@@ -555,10 +655,14 @@ class Game():
         for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
             player.query(round_state, player_message, self.log)
             player.bankroll += delta
+        METRICS.record_hand(players)
 
-    def run(self, verbose=True):
+    def run(self, verbose=True, players=None):
         '''
         Runs one game of poker.
+
+        players defaults to the two pokerbots in config.py; replay tools pass
+        their own Player implementations instead.
         '''
         if verbose:
             print('   __  _____________  ___       __           __        __    ')
@@ -567,12 +671,22 @@ class Game():
             print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
             print()
             print('Starting the Pokerbots engine...')
-        players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
-        ]
+        if self.deals is None:
+            # numpy is only needed once a game is actually played
+            from dealing import DealStream
+            self.deals = DealStream(self.seed, NUM_ROUNDS)
+        if self.deals.seed is not None:
+            self.log.append('Deal seed: ' + str(self.deals.seed))
+        if players is None:
+            players = [
+                Player(PLAYER_1_NAME, PLAYER_1_PATH, self.log_dir),
+                Player(PLAYER_2_NAME, PLAYER_2_PATH, self.log_dir)
+            ]
+        self.log[0] = '6.9630 MIT Pokerbots - ' + players[0].name + ' vs ' + players[1].name
+        self.seat(players)
 
         A_winnings = []
+        first_player = players[0]
 
         for player in players:
             player.build()
@@ -582,11 +696,7 @@ class Game():
             self.log.append('')
             status = STATUS(players)
             self.log.append('Round #' + str(round_num) + status)
-            if players[0].name == PLAYER_1_NAME:
-                A_winnings.append(players[0].bankroll)
-
-            else:
-                A_winnings.append(players[1].bankroll)
+            A_winnings.append(first_player.bankroll)
             self.run_round(players)
             players = players[::-1]
             
@@ -598,28 +708,27 @@ class Game():
             self.log.append('{} flop bets EV: {}'.format(player.name, self.ev_flop_bets[player.name]))
             self.log.append('{} turn bets EV: {}'.format(player.name, self.ev_turn_bets[player.name]))
             player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
+        name = os.path.join(self.log_dir, GAME_LOG_FILENAME + '.txt')
         if verbose:
             print('Writing', name)
         with open(name, 'w') as log_file:
             log_file.write('\n'.join(self.log))
+        METRICS.record_game(players)
 
-        return np.array(A_winnings)
+        return A_winnings
 
 
 if __name__ == '__main__':
-    total = np.zeros(NUM_ROUNDS)
+    if METRICS_PORT is not None:
+        start_server(METRICS_PORT)
+    if DEAL_SEED is None:
+        seeds = [None] * NUM_GAMES
+    else:
+        from dealing import game_seeds
+        seeds = game_seeds(DEAL_SEED, NUM_GAMES)
+    total = [0] * NUM_ROUNDS
     for i in range(NUM_GAMES):
-        total += Game().run(verbose=False)
+        total = [running + winnings for running, winnings in zip(total, Game('.', seeds[i]).run(verbose=False))]
         print(f"Game {i+1}")
 
-    total /= NUM_GAMES
-
-    plt.title(f"Player {PLAYER_1_NAME}'s Winnings Against Player {PLAYER_2_NAME}", fontsize=15)
-    plt.xlabel("Number of Rounds", fontsize=15)
-    plt.ylabel("Winnings", fontsize=15)
-    plt.plot([0] * NUM_ROUNDS, color='red')
-    plt.xticks(fontsize=15)
-    plt.yticks(fontsize=15)
-    plt.plot(total)
-    plt.show()
\ No newline at end of file
+    plot_winnings([running / NUM_GAMES for running in total], WINNINGS_PLOT_FILENAME)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Checks that importing the engine stays under a fixed time budget.
+
+Runs `python -X importtime -c "import engine"` in a fresh interpreter and
+reads the cumulative import time of the top-level module from stderr.
+Tournament workers and single-game runs pay this cost on every start, so
+heavy libraries (matplotlib, numpy) must only be imported where used.
+
+Usage:
+    python import_budget.py [module] [--budget-ms N] [--repeat N]
+
+Exits with status 1 if the best of the runs is over budget.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+DEFAULT_BUDGET_MS = 150.0
+HEAVY_MODULES = ('matplotlib', 'numpy')
+
+
+def import_profile(module: str) -> Dict[str, int]:
+    """
+    Imports module in a fresh interpreter under -X importtime.
+
+    Args:
+        module: Name of the module to import
+
+    Returns:
+        Mapping of every imported module to its cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent,
+        check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('module', nargs='?', default='engine')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    best_ms = None
+    for _ in range(args.repeat):
+        profile = import_profile(args.module)
+        elapsed_ms = profile[args.module] / 1000
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+
+    heavy = [name for name in profile if name in HEAVY_MODULES]
+    print(f"import {args.module}: {best_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    if heavy:
+        print(f"✗ {args.module} imports {', '.join(heavy)} at startup", file=sys.stderr)
+    if best_ms > args.budget_ms:
+        print(f"✗ over budget by {best_ms - args.budget_ms:.1f} ms", file=sys.stderr)
+    if heavy or best_ms > args.budget_ms:
+        sys.exit(1)
+    print("✓ within budget")
+
+
+if __name__ == "__main__":
+    main()
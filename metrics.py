@@ -0,0 +1,188 @@
+'''
+Engine throughput metrics, served in the Prometheus text exposition format.
+
+The engine records into the module-level METRICS registry as it plays; when
+METRICS_PORT is set a small stdlib HTTP server exposes it on /metrics.
+'''
+from collections import deque
+from threading import Lock, Thread
+import time
+
+LATENCY_WINDOW = 10000
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Metrics():
+    '''
+    Thread-safe counters, gauges and query latency windows for one engine process.
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Clears every metric and restarts the throughput clock.
+        '''
+        with self.lock:
+            self.start_time = time.monotonic()
+            self.hands = 0
+            self.games = 0
+            self.queries = {}
+            self.query_seconds = {}
+            self.latencies = {}
+            self.timeouts = {}
+            self.illegal_actions = {}
+            self.bankrolls = {}
+            self.total_bankrolls = {}
+
+    def record_query(self, name, latency):
+        '''
+        Records the round-trip time of one query to the named bot.
+        '''
+        with self.lock:
+            self.queries[name] = self.queries.get(name, 0) + 1
+            self.query_seconds[name] = self.query_seconds.get(name, 0.) + latency
+            self.latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def record_timeout(self, name):
+        with self.lock:
+            self.timeouts[name] = self.timeouts.get(name, 0) + 1
+
+    def record_illegal_action(self, name):
+        with self.lock:
+            self.illegal_actions[name] = self.illegal_actions.get(name, 0) + 1
+
+    def record_hand(self, players):
+        '''
+        Records a finished round and the players' running bankrolls.
+        '''
+        with self.lock:
+            self.hands += 1
+            for player in players:
+                self.bankrolls[player.name] = player.bankroll
+
+    def record_game(self, players):
+        '''
+        Records a finished game and adds the players' final bankrolls to their totals.
+        '''
+        with self.lock:
+            self.games += 1
+            for player in players:
+                self.total_bankrolls[player.name] = self.total_bankrolls.get(player.name, 0) + player.bankroll
+
+    def snapshot(self):
+        '''
+        Returns a picklable copy of the metrics, for shipping between processes.
+        '''
+        with self.lock:
+            return {
+                'hands': self.hands,
+                'games': self.games,
+                'queries': dict(self.queries),
+                'query_seconds': dict(self.query_seconds),
+                'latencies': {name: list(window) for name, window in self.latencies.items()},
+                'timeouts': dict(self.timeouts),
+                'illegal_actions': dict(self.illegal_actions),
+                'bankrolls': dict(self.bankrolls),
+                'total_bankrolls': dict(self.total_bankrolls),
+            }
+
+    def merge(self, snapshot):
+        '''
+        Adds a snapshot from another process, e.g. one finished tournament game.
+
+        Totals are summed; bankrolls are replaced, so they show the game that
+        finished last, and total_bankrolls track the sum across games.
+        '''
+        with self.lock:
+            self.hands += snapshot['hands']
+            self.games += snapshot['games']
+            for field in ('queries', 'query_seconds', 'timeouts', 'illegal_actions', 'total_bankrolls'):
+                totals = getattr(self, field)
+                for name, value in snapshot[field].items():
+                    totals[name] = totals.get(name, 0) + value
+            self.bankrolls.update(snapshot['bankrolls'])
+            for name, window in snapshot['latencies'].items():
+                self.latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).extend(window)
+
+    def render(self):
+        '''
+        Formats the metrics in the Prometheus text exposition format.
+        '''
+        with self.lock:
+            elapsed = time.monotonic() - self.start_time
+            lines = [
+                '# HELP pokerbots_hands_total Rounds played.',
+                '# TYPE pokerbots_hands_total counter',
+                'pokerbots_hands_total {}'.format(self.hands),
+                '# HELP pokerbots_hands_per_second Rounds played per second since the engine started.',
+                '# TYPE pokerbots_hands_per_second gauge',
+                'pokerbots_hands_per_second {:.3f}'.format(self.hands / elapsed if elapsed > 0 else 0.),
+                '# HELP pokerbots_games_total Games completed.',
+                '# TYPE pokerbots_games_total counter',
+                'pokerbots_games_total {}'.format(self.games),
+                '# HELP pokerbots_query_latency_seconds Engine to bot query round-trip time.',
+                '# TYPE pokerbots_query_latency_seconds summary',
+            ]
+            for name, window in sorted(self.latencies.items()):
+                ordered = sorted(window)
+                for quantile in QUANTILES:
+                    value = ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+                    lines.append('pokerbots_query_latency_seconds{{bot="{}",quantile="{}"}} {:.6f}'.format(
+                        name, quantile, value))
+                lines.append('pokerbots_query_latency_seconds_sum{{bot="{}"}} {:.6f}'.format(
+                    name, self.query_seconds[name]))
+                lines.append('pokerbots_query_latency_seconds_count{{bot="{}"}} {}'.format(name, self.queries[name]))
+            for field, kind, help_text in (
+                    ('timeouts', 'counter', 'Queries where the bot ran out of time.'),
+                    ('illegal_actions', 'counter', 'Illegal or misformatted actions sent by the bot.'),
+                    ('bankrolls', 'gauge', 'Bankroll of the bot in the current game, or the last one to finish.'),
+                    ('total_bankrolls', 'gauge', 'Final bankrolls of the bot summed over completed games.')):
+                metric = 'pokerbots_' + field + ('_total' if kind == 'counter' else '')
+                lines.append('# HELP {} {}'.format(metric, help_text))
+                lines.append('# TYPE {} {}'.format(metric, kind))
+                for name, value in sorted(getattr(self, field).items()):
+                    lines.append('{}{{bot="{}"}} {}'.format(metric, name, value))
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+def metrics_handler():
+    '''
+    Returns the request handler class serving METRICS on /metrics.
+
+    http.server is imported here rather than at the top, so importing the
+    engine does not pay for it when no metrics server is started.
+    '''
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = METRICS.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep scrapes out of the engine's output
+
+    return MetricsHandler
+
+
+def start_server(port, host='127.0.0.1'):
+    '''
+    Starts the metrics HTTP server in a daemon thread and returns it.
+    '''
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), metrics_handler())
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,231 @@
+'''
+Offline mock engine for benchmarking a pokerbot's decisions.
+
+Feeds a fixed stream of engine messages straight into a bot's skeleton
+Runner on this thread, without an engine socket or an opponent process,
+and times every get_action call. The stream is one engine message per line,
+exactly as the bot would receive them, and comes from
+    - a game log: the messages one player received during that game,
+    - a synthetic game: both seats play random legal actions on decks dealt
+      from a seed, or
+    - a stream file saved earlier with --save-stream.
+Because the stream already contains every action, the bot's answers do not
+change what it is sent next, so runs over the same stream are repeatable.
+
+Usage:
+    python mock_engine.py ./python_v2 --gamelog gamelog.txt --name Avishai
+    python mock_engine.py ./python_v2 --rounds 1000 --seed 1 [--repeat 5] [--json results.json]
+'''
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import time
+
+from config import NUM_ROUNDS
+from engine import Game, Player, RoundState, FoldAction, CallAction, CheckAction, RaiseAction, DiscardAction
+from replay import RecordedDeals, Script, load_bot, parse_gamelog, replay_rounds
+
+
+class RecordingPlayer(Player):
+    '''
+    A Player without a bot process that answers with choose(round_state) and
+    records every message the engine sends it.
+    '''
+
+    def __init__(self, name, choose):
+        super().__init__(name, None)
+        self.choose = choose
+        self.messages = []
+
+    def build(self):
+        pass
+
+    def run(self, verbose=True):
+        pass
+
+    def stop(self):
+        self.messages.append('Q')
+
+    def query(self, round_state, player_message, game_log):
+        player_message[0] = 'T{:.3f}'.format(self.game_clock)
+        self.messages.append(' '.join(player_message))
+        del player_message[1:]
+        if not isinstance(round_state, RoundState):
+            return CheckAction()
+        return self.choose(round_state)
+
+
+def random_policy(rng):
+    '''
+    Returns a choose function playing uniformly random legal actions.
+    '''
+    order = [DiscardAction, FoldAction, CallAction, CheckAction, RaiseAction]
+
+    def choose(round_state):
+        legal_actions = round_state.legal_actions()
+        action = rng.choice([action for action in order if action in legal_actions])
+        if action is RaiseAction:
+            min_raise, max_raise = round_state.raise_bounds()
+            return RaiseAction(rng.randint(min_raise, max_raise))
+        if action is DiscardAction:
+            return DiscardAction(rng.randrange(len(round_state.hands[round_state.button % 2])))
+        return action()
+    return choose
+
+
+def recorded_stream(gamelog, name):
+    '''
+    Returns the messages name received during the game in gamelog.
+    '''
+    names, seed, rounds = parse_gamelog(gamelog)
+    if name not in names:
+        raise SystemExit('{} did not play in this game'.format(name))
+    deals = RecordedDeals(rounds, seed)
+    players = [RecordingPlayer(player_name, Script(player_name, deals).next_action) for player_name in names]
+    game = Game(seed=None)
+    game.deals = deals
+    replay_rounds(game, players, rounds)
+    return players[names.index(name)].messages
+
+
+def synthetic_stream(num_rounds, seed):
+    '''
+    Returns the messages the first seat receives in a game of num_rounds
+    rounds of random play, dealt from seed.
+    '''
+    from dealing import DealStream
+    rng = random.Random(seed)
+    players = [RecordingPlayer('A', random_policy(rng)), RecordingPlayer('B', random_policy(rng))]
+    game = Game(seed=None)
+    game.deals = DealStream(seed, num_rounds)
+    game.seat(players)
+    for _ in range(num_rounds):
+        game.run_round(players)
+        players = players[::-1]
+    for player in players:
+        player.stop()
+    players.sort(key=lambda player: player.name)
+    return players[0].messages
+
+
+class MessageFeed():
+    '''
+    Stands in for the Runner's socket file: readline serves the stream one
+    message at a time and write collects the bot's responses.
+    '''
+
+    def __init__(self, messages):
+        self.messages = iter(messages)
+        self.responses = []
+
+    def readline(self):
+        return next(self.messages, 'Q') + '\n'
+
+    def write(self, data):
+        self.responses.append(data.rstrip('\n'))
+
+    def flush(self):
+        pass
+
+
+def run_stream(path, messages):
+    '''
+    Plays messages into a freshly loaded copy of the bot in path.
+
+    Returns:
+        Total seconds in Runner.run, the wall and CPU seconds of each
+        get_action call, and the bot's responses
+    '''
+    pokerbot, runner = load_bot(path)
+    get_action = pokerbot.get_action
+    wall_times = []
+    cpu_times = []
+
+    def timed_get_action(game_state, round_state, active):
+        start_cpu = time.thread_time()
+        start_time = time.perf_counter()
+        action = get_action(game_state, round_state, active)
+        wall_times.append(time.perf_counter() - start_time)
+        cpu_times.append(time.thread_time() - start_cpu)
+        return action
+
+    pokerbot.get_action = timed_get_action
+    feed = MessageFeed(messages)
+    # bots print freely; a terminal would dominate the timings
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start_time = time.perf_counter()
+        runner.Runner(pokerbot, feed).run()
+        elapsed = time.perf_counter() - start_time
+    return elapsed, wall_times, cpu_times, feed.responses
+
+
+def percentile(values, fraction):
+    '''
+    Returns the value at the given fraction of the sorted values.
+    '''
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.
+
+
+def summarize(elapsed, wall_times, cpu_times, num_messages):
+    '''
+    Summarizes one run in milliseconds and calls per second.
+    '''
+    return {
+        'messages': num_messages,
+        'decisions': len(wall_times),
+        'total_s': elapsed,
+        'messages_per_s': num_messages / elapsed if elapsed else 0.,
+        'decisions_per_s': len(wall_times) / sum(wall_times) if sum(wall_times) else 0.,
+        'mean_ms': 1000 * statistics.fmean(wall_times) if wall_times else 0.,
+        'p50_ms': 1000 * percentile(wall_times, 0.5),
+        'p90_ms': 1000 * percentile(wall_times, 0.9),
+        'p99_ms': 1000 * percentile(wall_times, 0.99),
+        'max_ms': 1000 * max(wall_times, default=0.),
+        'cpu_ms': 1000 * sum(cpu_times),
+    }
+
+
+def main():
+    '''Main execution function.'''
+    parser = argparse.ArgumentParser(description='Benchmarks a pokerbot on a fixed stream of engine messages.')
+    parser.add_argument('bot', help='directory of the bot, containing player.py')
+    parser.add_argument('--gamelog', help='take the stream a player received in this game log')
+    parser.add_argument('--name', help='the player in --gamelog whose stream to use')
+    parser.add_argument('--stream', help='read the stream from a file saved with --save-stream')
+    parser.add_argument('--rounds', type=int, default=NUM_ROUNDS, help='rounds of a synthetic stream')
+    parser.add_argument('--seed', type=int, default=0, help='seed of a synthetic stream')
+    parser.add_argument('--save-stream', help='write the stream to this file')
+    parser.add_argument('--repeat', type=int, default=1, help='runs, each on a freshly loaded bot')
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    if args.stream is not None:
+        with open(args.stream) as stream_file:
+            messages = stream_file.read().splitlines()
+    elif args.gamelog is not None:
+        if args.name is None:
+            parser.error('--gamelog needs --name')
+        messages = recorded_stream(args.gamelog, args.name)
+    else:
+        messages = synthetic_stream(args.rounds, args.seed)
+    if args.save_stream is not None:
+        with open(args.save_stream, 'w') as stream_file:
+            stream_file.write('\n'.join(messages) + '\n')
+
+    runs = []
+    for _ in range(args.repeat):
+        elapsed, wall_times, cpu_times, responses = run_stream(args.bot, messages)
+        runs.append(summarize(elapsed, wall_times, cpu_times, len(messages)))
+        print('{decisions} decisions in {total_s:.3f} s: {decisions_per_s:.0f} decisions/s, '
+              'mean {mean_ms:.3f} ms, p50 {p50_ms:.3f} ms, p99 {p99_ms:.3f} ms, max {max_ms:.3f} ms'.format(**runs[-1]))
+    if args.json is not None:
+        with open(args.json, 'w') as json_file:
+            json.dump({'bot': args.bot, 'runs': runs}, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -98,6 +98,7 @@ class Player(Bot):
         my_contribution = STARTING_STACK - my_stack
         # the number of chips your opponent has contributed to the pot
         opp_contribution = STARTING_STACK - opp_stack
+        # self.deadline is when to answer by, from the game clock; self.deadline.remaining() is the time left
 
         # Only use DiscardAction if it's in legal_actions (which already checks street)
         # legal_actions() returns DiscardAction only when street is 2 or 3
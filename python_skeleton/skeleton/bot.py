@@ -1,12 +1,19 @@
 '''
 This file contains the base class that you should implement for your pokerbot.
 '''
+from .budget import TimeBudget
 
 
 class Bot():
     '''
     The base class for a pokerbot.
+
+    Before each get_action, the runner sets self.deadline to a budget.Deadline
+    allotted by self.time_budget from the remaining game clock. Assign your own
+    TimeBudget to change how the clock is spent, or None to skip budgeting.
     '''
+    time_budget = TimeBudget()
+    deadline = None
 
     def handle_new_round(self, game_state, round_state, active):
         '''
@@ -36,6 +43,37 @@ class Bot():
         '''
         raise NotImplementedError('handle_round_over')
 
+    def handle_game_over(self, game_state):
+        '''
+        Optional. Called once when the game ends, before your bot exits; for
+        example to save what it learned for the next game.
+
+        Arguments:
+        game_state: the GameState object.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
+    def speculate(self, game_state, round_state, active, cancelled):
+        '''
+        Optional. Called on a worker thread after each of your responses, while
+        your bot waits for the engine, to precompute anything you are likely to
+        need next; the time is not charged to your game clock. Return as soon
+        as cancelled.is_set(), which happens when the next message arrives.
+
+        Arguments:
+        game_state: the GameState object.
+        round_state: the RoundState after your action, or the TerminalState of a finished round.
+        active: your player's index.
+        cancelled: a threading.Event.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
     def get_action(self, game_state, round_state, active):
         '''
         Where the magic happens - your code should implement this function.
@@ -0,0 +1,294 @@
+'''
+Hand abstraction: groups hands with similar equity distributions into buckets.
+
+A hand's equity distribution is the histogram, over runouts of the board,
+of its final-board strength: the share of live opponent holdings it beats
+on the complete board (ties count half). Hands with the same equity but
+different distributions (a draw against a middling made hand) play
+differently, so buckets are formed by k-means over these histograms,
+comparing them by earth mover's distance, which for histograms over one
+axis is the L1 distance between their cumulative sums. Centroids are the
+mean of their members, the usual approximation, and bucket ids are ordered
+by equity: bucket 0 holds the weakest hands.
+
+Streets with betting decisions are bucketed:
+
+    0   the 22100 three-card hands, reduced to their 1755 suit-isomorphic
+        classes. Our three cards always play (the discard goes to the
+        board), so runouts are the five other board cards; each runout
+        credits the discard that leaves the opponent weakest.
+    4   two kept cards on the 4-card board after both discards
+    5   the turn
+    6   the river, where the histogram is a single bin
+
+The preflop buckets are a dense uint8 table over skeleton.ranges.THREE_COMBOS,
+memory-mapped at runtime for O(1) lookups. The states of later streets
+number in the hundreds of millions, so the pipeline clusters a random
+sample of them and keeps the centroids; at runtime a state's histogram is
+computed like skeleton.strength's per-runout strengths (about 15 ms on
+the 4-card board, cached) and assigned to the nearest centroid.
+
+Buckets are built offline into the buckets directory next to the bot.
+From the bot's directory run
+
+    python -m skeleton.buckets [--buckets 0=64 4=64 5=64 6=32] [--samples 64] [--states 2000] [--workers 4]
+
+and in the bot
+
+    self.buckets = Buckets()
+    ...
+    bucket = self.buckets.bucket(my_cards, board_cards)
+'''
+import argparse
+import os
+import time
+from collections import OrderedDict
+from multiprocessing import Pool
+
+import numpy as np
+
+from .equity import BOARD_SIZE, COMBO_WORDS, as_ints, canonical, live_combos
+from .handeval import CARD_BITS, evaluate_words
+from .ranges import THREE_COMBOS, THREE_INDEX
+from .strength import AHEAD, TIED, StrengthEstimator, outcomes
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'buckets')
+BUCKETS = {0: 64, 4: 64, 5: 64, 6: 32}
+BINS = 20
+DEFAULT_SAMPLES = 64
+DEFAULT_STATES = 2000
+ITERATIONS = 50
+CHUNK_SIZE = 50
+CACHE_SIZE = 4096
+
+
+def _bin(strengths, bins):
+    return np.bincount(np.minimum((strengths * bins).astype(np.int64), bins - 1), minlength=bins)
+
+
+def preflop_histogram(hand, bins=BINS, samples=DEFAULT_SAMPLES, rng=None):
+    '''
+    Returns the equity distribution of a three-card hand over samples random runouts.
+    '''
+    rng = np.random.default_rng(rng)
+    hand = list(hand)
+    hand_word = int(CARD_BITS[hand].sum())
+    live = np.setdiff1d(np.arange(52), hand)
+    opp_words = COMBO_WORDS[live_combos(hand)]
+    keys = rng.random((samples, len(live)))
+    others = CARD_BITS[live[np.argpartition(keys, BOARD_SIZE - 2, axis=1)[:, :BOARD_SIZE - 1]]].sum(axis=1)
+    hero = evaluate_words(hand_word + others)
+    valid = (opp_words & others[:, None]) == 0
+    # the opponent's holdings by runout by our discard
+    villain = evaluate_words((opp_words + others[:, None])[:, :, None] + CARD_BITS[hand])
+    final = outcomes(hero[:, None, None], villain)
+    scores = valid[:, :, None] * ((final == AHEAD) + (final == TIED) / 2)
+    strengths = (scores.sum(axis=1) / valid.sum(axis=1)[:, None]).max(axis=1)
+    return _bin(strengths, bins) / samples
+
+
+def strength_histogram(hole, board, bins=BINS, estimator=None):
+    '''
+    Returns the equity distribution of two hole cards on a board of 4 to 6
+    cards, over the runouts estimator (a StrengthEstimator) yields.
+    '''
+    estimator = estimator or StrengthEstimator(DEFAULT_SAMPLES)
+    opp_words = COMBO_WORDS[live_combos(hole + board)]
+    board_word = int(CARD_BITS[board].sum())
+    hero_word = board_word + int(CARD_BITS[hole].sum())
+    missing = BOARD_SIZE - len(board)
+    batches = estimator.runout_batches(hole + board, missing) if missing else [np.zeros(1, dtype=np.int64)]
+    counts = np.zeros(bins)
+    for runout_words in batches:
+        valid = (opp_words & runout_words[:, None]) == 0
+        final = outcomes(evaluate_words(hero_word + runout_words)[:, None],
+                         evaluate_words(opp_words + (board_word + runout_words[:, None])))
+        strengths = (valid * ((final == AHEAD) + (final == TIED) / 2)).sum(axis=1) / valid.sum(axis=1)
+        counts += _bin(strengths, bins)
+    return counts / counts.sum()
+
+
+def preflop_classes():
+    '''
+    Returns a representative hand of each suit-isomorphic class of three-card
+    hands, and the class of every hand in THREE_COMBOS.
+    '''
+    classes = {}
+    labels = np.zeros(len(THREE_COMBOS), dtype=np.int64)
+    for i, hand in enumerate(THREE_COMBOS.tolist()):
+        (key, _), _ = canonical(hand, [])
+        labels[i] = classes.setdefault(key, len(classes))
+    return np.array(list(classes), dtype=np.int64), labels
+
+
+def build_preflop(job):
+    '''
+    Computes the histograms of a chunk of three-card hands.
+    '''
+    hands, bins, samples, seed = job
+    rng = np.random.default_rng(seed)
+    return np.array([preflop_histogram(hand, bins, samples, rng) for hand in hands])
+
+
+def build_states(job):
+    '''
+    Computes the histograms of count random states with street cards on the board.
+    '''
+    street, count, bins, samples, seed = job
+    rng = np.random.default_rng(seed)
+    estimator = StrengthEstimator(samples, seed=rng)
+    histograms = np.zeros((count, bins))
+    for i in range(count):
+        cards = rng.choice(52, 2 + street, replace=False).tolist()
+        histograms[i] = strength_histogram(cards[:2], cards[2:], bins, estimator)
+    return histograms
+
+
+def emd(cdfs, centroids):
+    '''
+    Returns the earth mover's distance of every cumulative histogram to every centroid.
+    '''
+    return np.abs(cdfs[:, None, :] - centroids[None, :, :]).sum(axis=2)
+
+
+def kmeans(histograms, k, weights=None, iterations=ITERATIONS, seed=0):
+    '''
+    Clusters histograms under earth mover's distance, seeded by k-means++.
+
+    Returns the centroids as cumulative histograms ordered from the weakest
+    to the strongest, and the bucket of every histogram.
+    '''
+    rng = np.random.default_rng(seed)
+    cdfs = np.cumsum(histograms, axis=1)
+    weights = np.ones(len(cdfs)) if weights is None else np.asarray(weights, dtype=float)
+    k = min(k, len(cdfs))
+    centroids = cdfs[[rng.choice(len(cdfs), p=weights / weights.sum())]]
+    while len(centroids) < k:
+        nearest = emd(cdfs, centroids).min(axis=1) ** 2 * weights
+        if nearest.sum() <= 0.:
+            break
+        centroids = np.vstack([centroids, cdfs[rng.choice(len(cdfs), p=nearest / nearest.sum())]])
+    for _ in range(iterations):
+        labels = emd(cdfs, centroids).argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=len(centroids))
+        updated = np.stack([np.bincount(labels, weights=weights * cdfs[:, j], minlength=len(centroids))
+                            for j in range(cdfs.shape[1])], axis=1)
+        used = totals > 0
+        updated[used] /= totals[used, None]
+        updated[~used] = centroids[~used]
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    # a lower cumulative histogram puts more weight on high strengths
+    centroids = centroids[np.argsort(-centroids.sum(axis=1), kind='stable')]
+    return centroids, emd(cdfs, centroids).argmin(axis=1)
+
+
+def build_buckets(buckets=BUCKETS, bins=BINS, samples=DEFAULT_SAMPLES, states=DEFAULT_STATES, workers=None, seed=0):
+    '''
+    Returns the preflop bucket table and {street: centroids} for the streets in buckets.
+    '''
+    seeds = np.random.SeedSequence(seed)
+    table = None
+    centroids = {}
+    with Pool(workers) as pool:
+        if 0 in buckets:
+            hands, labels = preflop_classes()
+            chunks = [hands[start:start + CHUNK_SIZE] for start in range(0, len(hands), CHUNK_SIZE)]
+            jobs = [(chunk, bins, samples, child) for chunk, child in zip(chunks, seeds.spawn(len(chunks)))]
+            histograms = np.concatenate(pool.map(build_preflop, jobs))
+            centroids[0], classes = kmeans(histograms, buckets[0], np.bincount(labels), seed=seed)
+            table = classes[labels].astype(np.uint8)
+        for street in sorted(set(buckets) - {0}):
+            counts = [min(CHUNK_SIZE, states - start) for start in range(0, states, CHUNK_SIZE)]
+            jobs = [(street, count, bins, samples, child) for count, child in zip(counts, seeds.spawn(len(counts)))]
+            histograms = np.concatenate(pool.map(build_states, jobs))
+            centroids[street], _ = kmeans(histograms, buckets[street], seed=seed)
+    return table, centroids
+
+
+class Buckets():
+    '''
+    Looks up the bucket of a hand from tables built by python -m skeleton.buckets.
+    '''
+
+    def __init__(self, path=DEFAULT_DIR, cache_size=CACHE_SIZE, seed=None):
+        self.path = path
+        preflop = os.path.join(path, 'preflop.npy')
+        self.table = np.load(preflop, mmap_mode='r') if os.path.exists(preflop) else None
+        self.seed = seed
+        self.centroids = None  # loaded on the first lookup after the discards
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def load_centroids(self):
+        with np.load(os.path.join(self.path, 'centroids.npz')) as saved:
+            self.bins = int(saved['bins'])
+            self.estimator = StrengthEstimator(int(saved['samples']), seed=self.seed)
+            self.centroids = {int(name.split('_')[1]): saved[name] for name in saved.files if name.startswith('street_')}
+
+    def preflop(self, hand):
+        '''
+        Returns the bucket of a three-card hand, a single table lookup.
+        '''
+        a, b, c = as_ints(hand)
+        return int(self.table[THREE_INDEX[a, b, c]])
+
+    def bucket(self, hole, board):
+        '''
+        Returns the bucket of three hole cards before the flop, or of two
+        kept cards on a board of 4 to 6 cards.
+        '''
+        hole, board = as_ints(hole), as_ints(board)
+        if len(hole) == 3 and not board:
+            return self.preflop(hole)
+        if self.centroids is None:
+            self.load_centroids()
+        if len(hole) != 2 or len(board) not in self.centroids:
+            raise ValueError('no buckets for {} hole cards on a board of {}'.format(len(hole), len(board)))
+        (key_hole, key_board), _ = canonical(hole, board)
+        key = key_hole + key_board
+        result = self.cache.get(key)
+        if result is None:
+            cdf = np.cumsum(strength_histogram(list(key_hole), list(key_board), self.bins, self.estimator))
+            result = int(emd(cdf[None], self.centroids[len(board)]).argmin())
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return result
+
+
+def parse_buckets(text):
+    street, count = text.split('=')
+    return int(street), int(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m skeleton.buckets', description='Builds the hand bucket tables.')
+    parser.add_argument('--buckets', nargs='+', type=parse_buckets, default=list(BUCKETS.items()),
+                        metavar='STREET=COUNT', help='buckets per street, among 0, 4, 5 and 6')
+    parser.add_argument('--bins', type=int, default=BINS, help='histogram bins')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='runouts per histogram')
+    parser.add_argument('--states', type=int, default=DEFAULT_STATES, help='random states clustered per street after the discards')
+    parser.add_argument('--workers', type=int, help='worker processes, defaults to the CPU count')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=DEFAULT_DIR, help='output directory')
+    args = parser.parse_args()
+    buckets = dict(args.buckets)
+    if not set(buckets) <= set(BUCKETS) or not all(0 < count <= 256 for count in buckets.values()):
+        parser.error('streets are 0, 4, 5 and 6, with 1 to 256 buckets each')
+    start = time.perf_counter()
+    table, centroids = build_buckets(buckets, args.bins, args.samples, args.states, args.workers, args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    if table is not None:
+        np.save(os.path.join(args.out, 'preflop.npy'), table)
+    np.savez(os.path.join(args.out, 'centroids.npz'), bins=args.bins, samples=args.samples,
+             **{'street_{}'.format(street): c.astype(np.float32) for street, c in centroids.items()})
+    print('Wrote {} ({}) in {:.1f} s'.format(args.out, ', '.join(
+        'street {}: {} buckets'.format(street, len(c)) for street, c in centroids.items()), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''
+Spends the game clock across the remaining decisions.
+
+Before each get_action the Runner asks the bot's time_budget for a
+Deadline and stores it as the bot's deadline attribute. TimeBudget splits
+the clock left (less a reserve for the engine round trips) evenly over the
+rounds left, and gives each decision a share of its round's time according
+to the street. Budgets are recomputed from the real clock every time, so
+time that cheap rounds leave unused flows to later decisions, and a bot
+that overspends is automatically given less.
+
+Deadline has helpers for anytime computations, which keep improving an
+answer until time runs out:
+
+    def get_action(self, game_state, round_state, active):
+        best = self.deadline.anytime(lambda best: self.improve(best), self.quick_answer())
+        ...
+
+    for depth in self.deadline.iterations():
+        ...
+'''
+import time
+
+from .states import NUM_ROUNDS
+
+# a round's decisions weighted by street; a decision on street s gets
+# STREET_WEIGHTS[s] / ROUND_WEIGHT of the round's time. A player is asked
+# once on each street of a round played to the river (on the discard
+# streets once to discard and once to check), so ROUND_WEIGHT is the sum
+STREET_WEIGHTS = {0: 1.0, 2: 0.5, 3: 0.5, 4: 1.5, 5: 1.0, 6: 1.0}
+ROUND_WEIGHT = sum(STREET_WEIGHTS.values())
+
+
+class Deadline():
+    '''
+    A point in time, by time.perf_counter(), by which an answer is due.
+    '''
+    __slots__ = ('start', 'end')
+
+    def __init__(self, seconds, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.end = self.start + max(seconds, 0.)
+
+    def remaining(self):
+        '''
+        Returns the seconds left, or 0. once the deadline has passed.
+        '''
+        return max(self.end - time.perf_counter(), 0.)
+
+    def expired(self):
+        return time.perf_counter() >= self.end
+
+    def iterations(self, minimum=1):
+        '''
+        Yields 0, 1, 2, ... until the deadline passes, but at least minimum times.
+
+        An iteration that starts just before the deadline still runs to its
+        end, so keep each one short relative to the budget.
+        '''
+        count = 0
+        while count < minimum or time.perf_counter() < self.end:
+            yield count
+            count += 1
+
+    def anytime(self, improve, best=None, minimum=1):
+        '''
+        Repeatedly replaces best with improve(best) until the deadline passes,
+        and returns the last result. improve may raise StopIteration when it
+        cannot improve further.
+        '''
+        for _ in self.iterations(minimum):
+            try:
+                best = improve(best)
+            except StopIteration:
+                break
+        return best
+
+
+class TimeBudget():
+    '''
+    Allots each decision a share of the remaining game clock.
+
+    reserve: seconds of clock never allotted, covering the engine round trips
+    and parsing that are also charged to the clock.
+    max_share: the largest fraction of the unreserved clock one decision may use.
+    round_weight: the total weight of a round's decisions, by default the sum of street_weights.
+    '''
+
+    def __init__(self, reserve=2., max_share=0.05, street_weights=STREET_WEIGHTS, round_weight=None):
+        self.reserve = reserve
+        self.max_share = max_share
+        self.street_weights = street_weights
+        self.round_weight = sum(street_weights.values()) if round_weight is None else round_weight
+
+    def seconds(self, game_state, round_state):
+        '''
+        Returns the seconds the current decision may use.
+        '''
+        clock = game_state.game_clock - self.reserve
+        if clock <= 0.:
+            return 0.
+        rounds_left = max(NUM_ROUNDS - game_state.round_num + 1, 1)  # including this one
+        share = self.street_weights.get(round_state.street, 1.) / self.round_weight
+        return min(clock * share / rounds_left, clock * self.max_share)
+
+    def deadline(self, game_state, round_state, start=None):
+        '''
+        Returns the Deadline of the current decision, counting from start
+        (when the engine's message arrived) if given.
+        '''
+        return Deadline(self.seconds(game_state, round_state), start)
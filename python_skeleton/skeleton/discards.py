@@ -0,0 +1,214 @@
+'''
+Likelihoods of the opponent's discard under reference discard policies.
+
+The card the opponent discards says a lot about the two they kept. For each
+reference policy this module tabulates P(discard card j | three-card hand,
+flop) for every hand in skeleton.ranges.THREE_COMBOS and every flop, so an
+OpponentRange can update on a discard with one table lookup:
+
+    lowest      discards the lowest rank, like python_good_cards
+    toss_logic  python_v2's eval_discard heuristic, including its noise
+    equity      discards the card that leaves the most showdown equity,
+                estimated on shared random runouts
+
+Flops are reduced to their 169 suit-isomorphic classes and hands relabeled
+to match, so a table holds 169 x 22100 x 3 probabilities, stored as uint8
+in 255ths (lowest does not depend on the flop and holds one flop). The
+tables only see the flop: for the second player to discard, toss_logic
+also reacts to the first discard, which they ignore.
+
+Tables are built offline into discard_tables.npz in the bot's directory.
+From the bot's directory run
+
+    python -m skeleton.discards [--policies lowest toss_logic equity] [--samples 100] [--workers 4]
+
+and in the bot
+
+    self.opp_range = OpponentRange(DiscardModel(policy={'toss_logic': 0.5, 'equity': 0.5}))
+'''
+import argparse
+import itertools
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from .handeval import CARD_BITS, evaluate_words
+from .ranges import THREE_COMBOS, THREE_INDEX, THREE_WORDS
+from .texture import textures
+
+POLICIES = ('lowest', 'toss_logic', 'equity')
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'discard_tables.npz')
+NOISE_DRAWS = 256
+DEFAULT_SAMPLES = 100
+
+
+def flop_relabel(a, b):
+    '''
+    Returns the suit relabeling (an array indexed by suit) that takes the
+    flop a, b to its canonical form: the higher card's suit becomes 0, the
+    other card's 1, and the remaining suits follow in order.
+    '''
+    high, low = max(a, b), min(a, b)
+    order = [high & 3] + [low & 3] * (low & 3 != high & 3)
+    order += [s for s in range(4) if s not in order]
+    relabel = np.zeros(4, dtype=np.int64)
+    relabel[order] = np.arange(4)
+    return relabel
+
+
+def _build_flop_classes():
+    '''
+    Returns the canonical flops, each flop's class index and each flop's relabeling.
+    '''
+    flop_class = np.zeros((52, 52), dtype=np.int64)
+    relabels = np.zeros((52, 52, 4), dtype=np.int64)
+    canonical = {}
+    for a, b in itertools.permutations(range(52), 2):
+        relabel = flop_relabel(a, b)
+        key = tuple(sorted(int((c & ~3) | relabel[c & 3]) for c in (a, b)))
+        flop_class[a, b] = canonical.setdefault(key, len(canonical))
+        relabels[a, b] = relabel
+    return np.array(list(canonical), dtype=np.int64), flop_class, relabels
+
+
+CANONICAL_FLOPS, FLOP_CLASS, FLOP_RELABELS = _build_flop_classes()
+# the three-card hands holding each card
+CONTAINING = np.array([np.flatnonzero((THREE_COMBOS == card).any(axis=1)) for card in range(52)])
+
+
+def lowest_policy(flop):
+    '''
+    Discards the lowest rank, splitting ties evenly since the order cards are dealt in is random.
+    '''
+    ranks = THREE_COMBOS >> 2
+    lowest = ranks == ranks.min(axis=1, keepdims=True)
+    return lowest / lowest.sum(axis=1, keepdims=True)
+
+
+def toss_logic_policy(flop, draws=NOISE_DRAWS, seed=0):
+    '''
+    python_v2's eval_discard as the first player to discard, with its uniform
+    noise integrated over draws samples.
+    '''
+    ranks = THREE_COMBOS >> 2
+    # the board each card would leave: the two-card flop plus the card
+    future = textures(CARD_BITS[THREE_COMBOS] + int(CARD_BITS[list(flop)].sum()))
+    # flush danger: cards of the dropped card's suit on that board
+    suited = np.take_along_axis(future['suits'], (THREE_COMBOS & 3)[..., None], axis=-1)[..., 0]
+    scores = np.where(suited >= 3, 100., np.where(suited == 2, 20., 0.))
+    # straight danger: three distinct consecutive ranks
+    scores += 50. * (future['run'] >= 3)
+    scores += 1.5 * ranks
+    noise = np.random.default_rng(seed).uniform(0, 5, (draws, 1, 3))
+    choice = (scores + noise).argmin(axis=2)
+    probabilities = np.stack([(choice == j).mean(axis=0) for j in range(3)], axis=1)
+    # pair splitting: a pair with a kicker more than four ranks above it drops one of the pair
+    for j, (k, l) in enumerate(((1, 2), (0, 2), (0, 1))):
+        split = (ranks[:, k] == ranks[:, l]) & (ranks[:, j] > ranks[:, k] + 4)
+        probabilities[split] = 0.
+        probabilities[split, k] = probabilities[split, l] = 0.5
+    return probabilities
+
+
+def equity_policy(flop, samples=DEFAULT_SAMPLES, seed=0):
+    '''
+    Discards the card with the highest showdown equity against a random
+    opponent, estimated for every hand on the same samples runouts.
+    '''
+    flop_word = int(CARD_BITS[list(flop)].sum())
+    live = np.setdiff1d(np.arange(52), flop)
+    rng = np.random.default_rng(seed)
+    totals = np.zeros((len(THREE_COMBOS), 3))
+    counts = np.zeros(len(THREE_COMBOS))
+    hand_bits = CARD_BITS[THREE_COMBOS]
+    for _ in range(samples):
+        # opponent's two cards, then the other discard, turn and river
+        drawn = rng.choice(live, 5, replace=False)
+        opp_word = int(CARD_BITS[drawn[:2]].sum())
+        runout_word = int(CARD_BITS[drawn[2:]].sum())
+        valid = (THREE_WORDS & (opp_word | runout_word)) == 0
+        hero = evaluate_words(THREE_WORDS[valid] + flop_word + runout_word)
+        villain = evaluate_words(hand_bits[valid] + (opp_word + flop_word + runout_word))
+        totals[valid] += (np.sign(hero[:, None] - villain) + 1) / 2
+        counts += valid
+    equities = totals / np.maximum(counts, 1)[:, None]
+    best = equities == equities.max(axis=1, keepdims=True)
+    return best / best.sum(axis=1, keepdims=True)
+
+
+def build_table(job):
+    '''
+    Tabulates one policy on one canonical flop as uint8 255ths.
+    '''
+    policy, flop, samples = job
+    if policy == 'lowest':
+        probabilities = lowest_policy(flop)
+    elif policy == 'toss_logic':
+        probabilities = toss_logic_policy(flop)
+    else:
+        probabilities = equity_policy(flop, samples)
+    probabilities[(THREE_WORDS & int(CARD_BITS[list(flop)].sum())) != 0] = 0.
+    return np.rint(probabilities * 255).astype(np.uint8)
+
+
+def build_tables(policies=POLICIES, samples=DEFAULT_SAMPLES, workers=None):
+    '''
+    Returns {policy: (flops, 22100, 3) uint8 table} for the given policies.
+    '''
+    tables = {}
+    with Pool(workers) as pool:
+        for policy in policies:
+            flops = CANONICAL_FLOPS[:1] if policy == 'lowest' else CANONICAL_FLOPS
+            tables[policy] = np.stack(pool.map(build_table, [(policy, tuple(flop), samples) for flop in flops]))
+    return tables
+
+
+class DiscardModel():
+    '''
+    Discard likelihoods for OpponentRange.observe_discard from prebuilt tables.
+
+    policy: a policy name, or a dict of policy names to weights for an
+    opponent who plays like a mixture of them.
+    '''
+
+    def __init__(self, path=DEFAULT_PATH, policy='toss_logic'):
+        weights = {policy: 1.} if isinstance(policy, str) else dict(policy)
+        with np.load(path) as tables:
+            flops = max(len(tables[name]) for name in weights)
+            self.table = np.zeros((flops, len(THREE_COMBOS), 3), dtype=np.float32)
+            for name, weight in weights.items():
+                self.table += tables[name] * np.float32(weight / 255 / sum(weights.values()))
+
+    def likelihood(self, card, flop):
+        '''
+        Returns, for every hand in THREE_COMBOS, the probability that it discards card on flop.
+        '''
+        a, b = flop
+        relabel = FLOP_RELABELS[a, b]
+        table = self.table[FLOP_CLASS[a, b] if len(self.table) > 1 else 0]
+        hands = CONTAINING[card]
+        cards = THREE_COMBOS[hands]
+        mapped = (cards & ~3) | relabel[cards & 3]
+        position = (mapped < ((card & ~3) | relabel[card & 3])).sum(axis=1)
+        likelihood = np.zeros(len(THREE_COMBOS))
+        likelihood[hands] = table[THREE_INDEX[mapped[:, 0], mapped[:, 1], mapped[:, 2]], position]
+        return likelihood
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m skeleton.discards', description='Builds the discard likelihood tables.')
+    parser.add_argument('--policies', nargs='+', choices=POLICIES, default=list(POLICIES), help='policies to tabulate')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='runouts per flop for the equity policy')
+    parser.add_argument('--workers', type=int, help='worker processes, defaults to the CPU count')
+    parser.add_argument('--out', default=DEFAULT_PATH, help='output file')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    tables = build_tables(args.policies, args.samples, args.workers)
+    np.savez_compressed(args.out, **tables)
+    print('Wrote {} ({}) in {:.1f} s'.format(args.out, ', '.join(tables), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
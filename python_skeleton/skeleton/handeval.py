@@ -0,0 +1,152 @@
+'''
+Batch hand evaluation in NumPy.
+
+evaluate takes an (n, k) array of integer cards (skeleton.cards encoding,
+5 <= k <= 8) and scores every row with the same values pkrbot.evaluate
+returns, so scores from either can be compared. A value packs the hand
+type (1 high card to 9 straight flush) into bits 20-23 and the ranks that
+break ties below it: a 13-bit mask of the five ranks for high cards and
+flushes, the straight's top rank - 2 for straights, and the ranks of the
+sets followed by the kickers, four bits each, for the rest.
+
+A set of cards is held as a 52-bit word with bit 13 * suit + rank set for
+each card, so the word of hole cards plus a board is the sum of their
+words. Rows are scored with bit operations on these words and lookups into
+8192-entry tables indexed by 13-bit rank masks, at a fraction of the cost
+per hand of calling pkrbot.evaluate from Python. evaluate_words scores
+words directly, which lets callers build a board's word once and add each
+holding's word to it.
+'''
+import numpy as np
+
+HIGH_CARD = 1
+PAIR = 2
+TWO_PAIR = 3
+TRIPS = 4
+STRAIGHT = 5
+FLUSH = 6
+FULL_HOUSE = 7
+QUADS = 8
+STRAIGHT_FLUSH = 9
+
+RANK_BITS = 1 << np.arange(13, dtype=np.int64)
+MASKS = np.arange(1 << 13, dtype=np.int64)
+
+
+def _build_tables():
+    '''
+    Returns the rank-mask lookup tables: index of the highest rank, bit of the
+    highest rank, the five highest ranks and the straight value (0 for none).
+    '''
+    highest = np.zeros(1 << 13, dtype=np.int64)
+    high_bit = np.zeros(1 << 13, dtype=np.int64)
+    top_five = np.zeros(1 << 13, dtype=np.int64)
+    straights = np.zeros(1 << 13, dtype=np.int64)
+    for r in range(13):
+        has = (MASKS & (1 << r)) != 0
+        highest[has] = r
+        high_bit[has] = 1 << r
+    rest = MASKS.copy()
+    for _ in range(5):
+        top_five |= high_bit[rest]
+        rest ^= high_bit[rest]
+    wheel = RANK_BITS[[12, 0, 1, 2, 3]].sum()
+    straights[(MASKS & wheel) == wheel] = 1
+    for top in range(4, 13):
+        window = RANK_BITS[top - 4:top + 1].sum()
+        straights[(MASKS & window) == window] = top - 2
+    return highest, high_bit, top_five, straights
+
+
+HIGHEST, HIGH_BIT, TOP_FIVE, STRAIGHTS = _build_tables()
+CARD_BITS = np.array([1 << (13 * (card & 3) + (card >> 2)) for card in range(52)], dtype=np.int64)
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(1 << 13)], dtype=np.int64)
+
+
+def card_words(cards):
+    '''
+    Returns the 52-bit word of each row of an (n, k) array of distinct cards.
+    '''
+    return CARD_BITS[np.asarray(cards, dtype=np.int64)].sum(axis=-1)
+
+
+def rank_masks(words):
+    '''
+    Returns the masks of ranks appearing at least once, twice, three and four
+    times in each word, and the (n, 4) rank masks of each suit.
+    '''
+    c, d, h, s = [(words >> (13 * suit)) & 0x1FFF for suit in range(4)]
+    singles = c | d | h | s
+    pairs = (c & d) | (c & h) | (c & s) | (d & h) | (d & s) | (h & s)
+    trips = (c & d & h) | (c & d & s) | (c & h & s) | (d & h & s)
+    quads = c & d & h & s
+    return (singles, pairs, trips, quads), np.stack([c, d, h, s], axis=-1)
+
+
+def evaluate(cards):
+    '''
+    Scores each row of an (n, k) array of cards; returns an int64 array of n values.
+    '''
+    return evaluate_words(card_words(cards))
+
+
+def evaluate_words(words):
+    '''
+    Scores an array of card words of 5 to 8 cards each; returns int64 values of the same shape.
+    '''
+    words = np.asarray(words, dtype=np.int64)
+    shape = words.shape
+    (singles, pairs, trips, quads), suited = rank_masks(words.ravel())
+    n = len(singles)
+
+    flush_suit = POPCOUNT[suited].argmax(axis=1)
+    flush_mask = suited[np.arange(n), flush_suit]
+    is_flush = POPCOUNT[flush_mask] >= 5
+    straight_flush = STRAIGHTS[flush_mask]
+    straight = STRAIGHTS[singles]
+
+    quad_bit = HIGH_BIT[quads]
+    trip_bit = HIGH_BIT[trips]
+    other_pairs = pairs ^ trip_bit  # full house: the best pair besides the trips
+    first_pair = HIGH_BIT[pairs]
+    second_pair = HIGH_BIT[pairs ^ first_pair]
+    kickers = singles ^ first_pair
+    first_kicker = HIGH_BIT[kickers]
+    second_kicker = HIGH_BIT[kickers ^ first_kicker]
+
+    conditions = [
+        is_flush & (straight_flush > 0),
+        quads != 0,
+        (trips != 0) & (other_pairs != 0),
+        is_flush,
+        straight > 0,
+        trips != 0,
+        second_pair != 0,
+        pairs != 0,
+    ]
+    values = [
+        STRAIGHT_FLUSH << 20 | straight_flush << 16,
+        QUADS << 20 | HIGHEST[quads] << 16 | HIGHEST[singles ^ quad_bit] << 12,
+        FULL_HOUSE << 20 | HIGHEST[trips] << 16 | HIGHEST[other_pairs] << 12,
+        FLUSH << 20 | TOP_FIVE[flush_mask],
+        STRAIGHT << 20 | straight << 16,
+        TRIPS << 20 | HIGHEST[trips] << 16 | HIGHEST[singles ^ trip_bit] << 12
+        | HIGHEST[singles ^ trip_bit ^ HIGH_BIT[singles ^ trip_bit]] << 8,
+        TWO_PAIR << 20 | HIGHEST[first_pair] << 16 | HIGHEST[second_pair] << 12
+        | HIGHEST[singles ^ first_pair ^ second_pair] << 8,
+        PAIR << 20 | HIGHEST[first_pair] << 16 | HIGHEST[first_kicker] << 12 | HIGHEST[second_kicker] << 8
+        | HIGHEST[kickers ^ first_kicker ^ second_kicker] << 4,
+    ]
+    return np.select(conditions, values, HIGH_CARD << 20 | TOP_FIVE[singles]).reshape(shape)
+
+
+def showdown(hero, villain, board):
+    '''
+    Compares (n, 2) hole cards on (n, b) boards row by row.
+
+    Returns an int8 array of 1 where hero wins, 0 on ties and -1 where villain wins.
+    '''
+    board = np.asarray(board, dtype=np.int64)
+    hero_values = evaluate(np.concatenate([np.asarray(hero, dtype=np.int64), board], axis=1))
+    villain_values = evaluate(np.concatenate([np.asarray(villain, dtype=np.int64), board], axis=1))
+    return np.sign(hero_values - villain_values).astype(np.int8)
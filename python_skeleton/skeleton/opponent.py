@@ -0,0 +1,180 @@
+'''
+Statistics about the opponent, kept across games.
+
+Every game starts with a fresh Player, but matches are long runs of games
+against the same opponent. OpponentModel counts the opponent's actions in
+small NumPy arrays and saves them to a file in the bot's directory when a
+game ends, so the next game starts with everything learned so far:
+
+    actions[street, seat, kind]   folds, checks, calls, raises and discards
+    sizes[street, seat, bin]      raise sizes as a fraction of the pot, binned by SIZE_BINS
+    discard_order[i]              showdowns where their discard was their lowest (0),
+                                  middle (1) or highest (2) card
+    rounds, showdowns
+
+seat is the opponent's seat in the round (0 is the small blind). Counts
+from earlier games are multiplied by decay when loaded, so the model follows
+an opponent that adapts.
+
+record_round reads the opponent's actions back from a round's chain of
+states, so it belongs in handle_round_over, off the decision path; it only
+increments a few array cells. Save in handle_game_over:
+
+    def __init__(self):
+        self.opponent = OpponentModel()
+
+    def handle_round_over(self, game_state, terminal_state, active):
+        self.opponent.record_round(terminal_state, active)
+
+    def handle_game_over(self, game_state):
+        self.opponent.save()
+'''
+import os
+
+import numpy as np
+
+from .cards import encode
+from .states import STARTING_STACK
+
+FOLD = 0
+CHECK = 1
+CALL = 2
+RAISE = 3
+DISCARD = 4
+KINDS = ('fold', 'check', 'call', 'raise', 'discard')
+
+STREETS = 7  # indexed by street number: 0, 2, 3, 4, 5, 6
+SIZE_BINS = np.array([0.25, 0.5, 0.75, 1., 1.5, 2., 3., 5.])  # upper bin edges; the last bin is above 5
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'opponent_model.npz')
+DECAY = 0.9
+
+
+def round_history(terminal_state):
+    '''
+    Returns the RoundStates of a finished round in order, up to the last one before the payoffs.
+    '''
+    states = []
+    state = terminal_state.previous_state
+    while state is not None:
+        states.append(state)
+        state = state.previous_state
+    return states[::-1]
+
+
+def round_actions(terminal_state):
+    '''
+    Returns the actions of a finished round as (seat, street, kind, size)
+    tuples in order, where size is a raise's increment over the pot.
+    '''
+    states = round_history(terminal_state)
+    actions = []
+    called = False  # the previous transition was a call, so the next street change is automatic
+    for before, after in zip(states, states[1:]):
+        seat = before.button % 2
+        if after.street != before.street:
+            if not called:
+                actions.append((seat, before.street, CHECK, 0.))  # including the other player's check after a discard
+            called = False
+            continue
+        if before.street in (2, 3):
+            actions.append((seat, before.street, DISCARD, 0.))
+        elif after.pips[seat] > after.pips[1-seat]:
+            pot = 2 * STARTING_STACK - before.stacks[0] - before.stacks[1] + before.pips[1-seat] - before.pips[seat]
+            actions.append((seat, before.street, RAISE, (after.pips[seat] - before.pips[1-seat]) / max(pot, 1)))
+        elif after.pips[seat] > before.pips[seat]:
+            actions.append((seat, before.street, CALL, 0.))
+            # a call ends the street, except the small blind completing preflop
+            called = before.street != 0 or before.button != 0
+            continue
+        else:
+            actions.append((seat, before.street, CHECK, 0.))
+        called = False
+    last = states[-1]
+    if terminal_state_folded(terminal_state):
+        actions.append((last.button % 2, last.street, FOLD, 0.))
+    elif not called:
+        actions.append((last.button % 2, last.street, CHECK, 0.))  # the check that went to showdown
+    return actions
+
+
+def terminal_state_folded(terminal_state):
+    '''
+    Returns whether the round ended in a fold rather than a showdown: nobody's cards were revealed.
+    '''
+    hands = terminal_state.previous_state.hands
+    return not (hands[0] and hands[1])
+
+
+class OpponentModel():
+    '''
+    Action counts about the opponent in compact arrays, saved between games.
+    '''
+
+    def __init__(self, path=DEFAULT_PATH, decay=DECAY):
+        self.path = path
+        self.actions = np.zeros((STREETS, 2, len(KINDS)), dtype=np.float32)
+        self.sizes = np.zeros((STREETS, 2, len(SIZE_BINS) + 1), dtype=np.float32)
+        self.discard_order = np.zeros(3, dtype=np.float32)
+        self.counters = np.zeros(2, dtype=np.float32)  # rounds, showdowns
+        if path is not None and os.path.exists(path):
+            self.load(decay)
+
+    @property
+    def rounds(self):
+        return self.counters[0]
+
+    @property
+    def showdowns(self):
+        return self.counters[1]
+
+    def load(self, decay=DECAY):
+        with np.load(self.path) as saved:
+            for name in ('actions', 'sizes', 'discard_order', 'counters'):
+                if name in saved and saved[name].shape == getattr(self, name).shape:
+                    setattr(self, name, saved[name].astype(np.float32) * np.float32(decay))
+
+    def save(self):
+        '''
+        Writes the model to its file, replacing the old one only once it is complete.
+        '''
+        temporary = self.path + '.tmp.npz'
+        np.savez(temporary, actions=self.actions, sizes=self.sizes,
+                 discard_order=self.discard_order, counters=self.counters)
+        os.replace(temporary, self.path)
+
+    def record_round(self, terminal_state, active):
+        '''
+        Adds the opponent's actions in a finished round.
+        '''
+        opp = 1 - active
+        for seat, street, kind, size in round_actions(terminal_state):
+            if seat != opp:
+                continue
+            self.actions[street, opp, kind] += 1
+            if kind == RAISE:
+                self.sizes[street, opp, np.searchsorted(SIZE_BINS, size)] += 1
+        self.counters[0] += 1
+        previous_state = terminal_state.previous_state
+        kept = previous_state.hands[opp]
+        if len(kept) == 2 and not terminal_state_folded(terminal_state) and len(previous_state.board) >= 4:
+            self.counters[1] += 1
+            discard = encode([previous_state.board[2 if opp == 1 else 3]])[0]  # seat 1 discards first
+            self.discard_order[sum(card >> 2 < discard >> 2 for card in encode(kept))] += 1
+
+    def frequencies(self, street, seat, prior=1.):
+        '''
+        Returns the opponent's smoothed action frequencies on street from seat, indexed by kind.
+        '''
+        counts = self.actions[street, seat] + prior
+        if street in (2, 3):
+            counts[:DISCARD] = 0.
+        else:
+            counts[DISCARD] = 0.
+        return counts / counts.sum()
+
+    def size_frequencies(self, street, seat, prior=1.):
+        '''
+        Returns the smoothed distribution of the opponent's raise sizes over the SIZE_BINS bins.
+        '''
+        counts = self.sizes[street, seat] + prior
+        return counts / counts.sum()
@@ -0,0 +1,123 @@
+'''
+Profiles a pokerbot while it plays a real game.
+
+The engine turns profiling on for a bot by starting it with POKERBOT_PROFILE
+set to 'cprofile' or 'sampling' and POKERBOT_PROFILE_PATH set to the path
+prefix of the output files, next to the bot's <name>.txt log. Profiles only
+cover the bot's work on each engine message, not its waits for the next one.
+
+cprofile writes <prefix>_profile.prof (for pstats or snakeviz) and a
+cumulative-time summary in <prefix>_profile.txt. sampling records the main
+thread's stack every POKERBOT_PROFILE_INTERVAL seconds of CPU time, which
+costs far less than tracing every call, and writes collapsed stacks (one
+'frame;frame;frame count' line per stack, for flamegraph.pl or speedscope)
+to <prefix>.collapsed plus a summary in <prefix>_profile.txt.
+'''
+import cProfile
+import io
+import os
+import pstats
+import signal
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.001
+SUMMARY_LINES = 40
+
+
+class CallProfiler():
+    '''
+    Deterministic profiling of every call with cProfile.
+    '''
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.profile = cProfile.Profile()
+
+    def resume(self):
+        self.profile.enable()
+
+    def pause(self):
+        self.profile.disable()
+
+    def write(self):
+        self.profile.disable()
+        self.profile.dump_stats(self.prefix + '_profile.prof')
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        with open(self.prefix + '_profile.txt', 'w') as summary_file:
+            summary_file.write(stream.getvalue())
+
+
+class SamplingProfiler():
+    '''
+    Statistical profiling of the main thread by sampling its stack on SIGPROF.
+
+    The profiling timer only advances while the process uses CPU, so samples
+    land where the bot spends its clock and none accrue while it waits on the
+    engine; there is nothing to pause between messages. (A sampling thread
+    cannot do this: it only gets the GIL, and on a single pinned core the
+    CPU, when the bot blocks on the socket.) The kernel fires the timer at
+    most once per scheduler tick, typically every 1-4 ms.
+    '''
+
+    def __init__(self, prefix, interval=DEFAULT_INTERVAL):
+        self.prefix = prefix
+        self.interval = interval
+        self.stacks = Counter()
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(os.path.basename(code.co_filename) + ':' + code.co_name)
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def resume(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def write(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        with open(self.prefix + '.collapsed', 'w') as collapsed_file:
+            for stack, count in self.stacks.most_common():
+                collapsed_file.write('{} {}\n'.format(stack, count))
+        total = sum(self.stacks.values())
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        with open(self.prefix + '_profile.txt', 'w') as summary_file:
+            summary_file.write('{} samples every {} s of CPU time\n\n'.format(total, self.interval))
+            for title, counts in (('self', own), ('inclusive', inclusive)):
+                summary_file.write('{:>8} {:>7}  function\n'.format(title, '%'))
+                for frame, count in counts.most_common(SUMMARY_LINES):
+                    summary_file.write('{:8d} {:6.1f}%  {}\n'.format(count, 100 * count / max(total, 1), frame))
+                summary_file.write('\n')
+
+
+def from_environment():
+    '''
+    Returns the profiler requested by the engine through the environment, or None.
+    '''
+    mode = os.environ.get('POKERBOT_PROFILE')
+    prefix = os.environ.get('POKERBOT_PROFILE_PATH')
+    if not mode or not prefix:
+        return None
+    if mode == 'cprofile':
+        return CallProfiler(prefix)
+    if mode == 'sampling':
+        if not hasattr(signal, 'setitimer'):
+            print('Sampling needs setitimer, which this platform lacks; using cProfile instead')
+            return CallProfiler(prefix)
+        return SamplingProfiler(prefix, float(os.environ.get('POKERBOT_PROFILE_INTERVAL', DEFAULT_INTERVAL)))
+    print('Unknown POKERBOT_PROFILE mode', mode)
+    return None
@@ -0,0 +1,234 @@
+'''
+Tracks the opponent's possible holdings as probability vectors.
+
+Until the opponent discards, OpponentRange holds a probability for each of
+the 22100 three-card hands in THREE_COMBOS; once their discard is seen it
+holds one for each of the 1326 two-card hands they kept, in the order of
+skeleton.equity.HOLE_COMBOS. Combos holding a known card are zeroed with a
+single AND of precomputed card words, and each observation multiplies the
+vector by a likelihood and renormalizes it.
+
+Betting actions are weighed with a simple model of how hand strength, the
+percentile of a holding's made hand on the current board among the live
+holdings, drives betting: the opponent bets or raises with probability
+BLUFF + (1 - 2 * BLUFF) * strength ** 2 and checks otherwise. Bots with a
+better model can pass their own likelihoods to update.
+
+observe(round_state, active) applies everything new since the last call:
+the board and the opponent's discard (board[2] if they discard first,
+board[3] otherwise), weighed by the discard_model if one is given (see
+skeleton.discards), a bet or raise they made, or a check to us. Call it
+at the start of every get_action after new_round in handle_new_round:
+
+    self.opp_range.new_round(my_cards)
+    ...
+    self.opp_range.observe(round_state, active)
+    result = self.equity.equity(my_cards, board_cards, opp_range=self.opp_range.kept())
+'''
+import itertools
+
+import numpy as np
+
+from .cards import encode
+from .equity import COMBO_WORDS, HOLE_COMBOS, live_combos
+from .handeval import CARD_BITS, HIGHEST, rank_masks, evaluate_words
+from .states import BIG_BLIND
+
+THREE_COMBOS = np.array(list(itertools.combinations(range(52), 3)), dtype=np.int64)
+THREE_WORDS = CARD_BITS[THREE_COMBOS].sum(axis=1)
+BLUFF = 0.1
+
+
+def _build_indices():
+    '''
+    Returns the index of every three-card combo by its cards in any order,
+    and the indices of the three two-card combos inside each three-card combo.
+    '''
+    three_index = np.zeros((52, 52, 52), dtype=np.int32)
+    for a, b, c in itertools.permutations(range(3)):
+        three_index[THREE_COMBOS[:, a], THREE_COMBOS[:, b], THREE_COMBOS[:, c]] = np.arange(len(THREE_COMBOS))
+    pair_index = np.zeros((52, 52), dtype=np.int32)
+    pair_index[HOLE_COMBOS[:, 0], HOLE_COMBOS[:, 1]] = np.arange(len(HOLE_COMBOS))
+    pair_index[HOLE_COMBOS[:, 1], HOLE_COMBOS[:, 0]] = np.arange(len(HOLE_COMBOS))
+    kept_pairs = np.stack([pair_index[THREE_COMBOS[:, b], THREE_COMBOS[:, c]] for b, c in ((1, 2), (0, 2), (0, 1))], axis=1)
+    return three_index, kept_pairs
+
+
+# THREE_INDEX[a, b, c] is the combo of cards a, b, c; KEPT_PAIRS[i, j] is the
+# two-card combo kept when THREE_COMBOS[i] discards its card j
+THREE_INDEX, KEPT_PAIRS = _build_indices()
+
+
+def preflop_values(words):
+    '''
+    Orders three-card hands with no board by trips, then pairs, then ranks.
+    '''
+    (singles, pairs, trips, _), _ = rank_masks(words)
+    sets = np.where(trips != 0, 2, (pairs != 0).astype(np.int64))
+    return sets << 17 | HIGHEST[pairs] << 13 | singles
+
+
+PREFLOP_VALUES = preflop_values(THREE_WORDS)
+
+
+def percentiles(values, weights):
+    '''
+    Returns the share of live holdings (weights > 0) each value beats, counting ties as half.
+    '''
+    ordered = np.sort(values[weights > 0])
+    if len(ordered) < 2:
+        return np.full(len(values), 0.5)
+    below = np.searchsorted(ordered, values, 'left')
+    above = np.searchsorted(ordered, values, 'right')
+    return (below + above - 1) / 2 / (len(ordered) - 1)
+
+
+class OpponentRange():
+    '''
+    The opponent's holdings as a probability vector, updated by observation.
+    '''
+
+    def __init__(self, discard_model=None):
+        self.discard_model = discard_model  # e.g. a skeleton.discards.DiscardModel
+        self.three = None
+        self.two = None
+        self.dead = 0
+        self.seen = None
+        self.strengths = {}
+
+    def new_round(self, hand, board=()):
+        '''
+        Starts a round with every three-card hand not holding our cards equally likely.
+        '''
+        self.three = np.ones(len(THREE_COMBOS))
+        self.two = None
+        self.dead = 0
+        self.seen = {'board': 0, 'discard': False, 'street': None, 'opp_pip': None}
+        self.strengths = {}
+        self.remove(list(hand) + list(board))
+
+    def vector(self):
+        '''
+        Returns the current probability vector: over THREE_COMBOS before the discard, HOLE_COMBOS after.
+        '''
+        return self.three if self.two is None else self.two
+
+    def words(self):
+        return THREE_WORDS if self.two is None else COMBO_WORDS
+
+    def remove(self, cards):
+        '''
+        Zeroes the holdings that contain any of cards, which are now known to be elsewhere.
+        '''
+        cards = encode(cards) if cards and isinstance(cards[0], str) else list(cards)
+        self.dead |= int(CARD_BITS[cards].sum())
+        vector = self.vector()
+        vector[(self.words() & self.dead) != 0] = 0.
+        self.normalize()
+
+    def update(self, likelihood):
+        '''
+        Multiplies the current vector by the likelihood of an observation for each holding.
+        '''
+        vector = self.vector()
+        vector *= likelihood
+        self.normalize()
+
+    def normalize(self):
+        vector = self.vector()
+        total = vector.sum()
+        if total > 0.:
+            vector /= total
+        else:
+            # the observations contradict the model; fall back to every live holding
+            vector[:] = (self.words() & self.dead) == 0
+            vector /= vector.sum()
+
+    def strength(self, board):
+        '''
+        Returns each current holding's percentile strength on board, cached for the round.
+        '''
+        board = encode(board) if board and isinstance(board[0], str) else list(board)
+        key = (self.two is None, tuple(board))
+        if key not in self.strengths:
+            words = self.words()
+            if board:
+                values = evaluate_words(words + int(CARD_BITS[board].sum()))
+            else:
+                values = PREFLOP_VALUES
+            self.strengths[key] = percentiles(values, (words & self.dead) == 0)
+        return self.strengths[key]
+
+    def observe_bet(self, board, aggressive):
+        '''
+        Updates on the opponent betting or raising (aggressive) or checking.
+        '''
+        bet = BLUFF + (1 - 2 * BLUFF) * self.strength(board) ** 2
+        self.update(bet if aggressive else 1 - bet)
+
+    def observe_discard(self, card, likelihood=None):
+        '''
+        Moves to the two-card range after the opponent discards card.
+
+        likelihood optionally gives, for every three-card hand, the probability
+        that the opponent would discard card from it; by default every card of
+        a hand is equally likely to go.
+        '''
+        card = encode([card])[0] if isinstance(card, str) else int(card)
+        three = self.three if likelihood is None else self.three * likelihood
+        kept = live_combos([card])
+        self.two = np.zeros(len(HOLE_COMBOS))
+        self.two[kept] = three[THREE_INDEX[HOLE_COMBOS[kept, 0], HOLE_COMBOS[kept, 1], card]]
+        self.three = None
+        self.remove([card])
+
+    def kept(self):
+        '''
+        Returns the probability of each two-card holding in HOLE_COMBOS the
+        opponent keeps; before their discard, assuming every card is equally
+        likely to go. Pass it as the opp_range of EquityEstimator.
+        '''
+        if self.two is not None:
+            return self.two
+        return np.bincount(KEPT_PAIRS.ravel(), weights=np.repeat(self.three / 3, 3), minlength=len(HOLE_COMBOS))
+
+    def expectation(self, scores):
+        '''
+        Returns the expected value of per-holding scores, such as
+        skeleton.equity.combo_scores, over the kept range: a single dot product.
+        '''
+        return float(self.kept() @ scores)
+
+    def observe(self, round_state, active):
+        '''
+        Applies the board cards, discard and betting seen since the last call.
+        '''
+        seen = self.seen
+        board = round_state.board
+        opp = 1 - active
+        slot = 2 if opp == 1 else 3  # seat 1 discards first
+        if not seen['discard'] and len(board) > slot:
+            self.remove(board[seen['board']:slot])
+            likelihood = None
+            if self.discard_model is not None:
+                card, a, b = encode([board[slot], board[0], board[1]])
+                likelihood = self.discard_model.likelihood(card, (a, b))
+            self.observe_discard(board[slot], likelihood)
+            seen['discard'] = True
+            seen['board'] = slot + 1
+        if len(board) > seen['board']:
+            self.remove(board[seen['board']:])
+            seen['board'] = len(board)
+        street = round_state.street
+        if street in (2, 3) or round_state.button % 2 != active:
+            return
+        opp_pip = round_state.pips[opp]
+        if (street, opp_pip) == (seen['street'], seen['opp_pip']):
+            return
+        first_decision = street != seen['street']
+        seen['street'], seen['opp_pip'] = street, opp_pip
+        if opp_pip > round_state.pips[active]:
+            if street != 0 or opp_pip > BIG_BLIND:
+                self.observe_bet(board, True)
+        elif first_decision and street > 3 and opp == 1:
+            self.observe_bet(board, False)  # they acted first on this street and checked
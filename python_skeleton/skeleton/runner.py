@@ -3,10 +3,13 @@ The infrastructure for interacting with the engine.
 '''
 import argparse
 import socket
+import time
 from .actions import FoldAction, CallAction, CheckAction, RaiseAction, DiscardAction
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from .bot import Bot
+from .speculation import Speculator
+from . import profiler, tracer
 
 
 class Runner():
@@ -14,9 +17,13 @@ class Runner():
     Interacts with the engine.
     '''
 
-    def __init__(self, pokerbot, socketfile):
+    def __init__(self, pokerbot, socketfile, profiler=None, tracer=None):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.profiler = profiler
+        self.tracer = tracer
+        self.speculator = Speculator(pokerbot.speculate) if type(pokerbot).speculate is not Bot.speculate else None
+        self.received = time.perf_counter()
 
     def receive(self):
         '''
@@ -24,6 +31,9 @@ class Runner():
         '''
         while True:
             packet = self.socketfile.readline().strip().split(' ')
+            self.received = time.perf_counter()
+            if self.speculator is not None:
+                self.speculator.cancel()
             if not packet:
                 break
             yield packet
@@ -54,6 +64,8 @@ class Runner():
         active = 0
         round_flag = True
         for packet in self.receive():
+            if self.profiler is not None:
+                self.profiler.resume()
             for clause in packet:
                 if clause[0] == 'T':
                     game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
@@ -112,13 +124,48 @@ class Runner():
                     game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num + 1)
                     round_flag = True
                 elif clause[0] == 'Q':
+                    self.pokerbot.handle_game_over(game_state)
                     return
             if round_flag or isinstance(round_state, TerminalState):  # ack the engine
                 self.send(CheckAction())
+                if self.speculator is not None:
+                    self.speculator.start(game_state, round_state, active)
             else:
                 ##assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
+                if self.pokerbot.time_budget is not None:
+                    self.pokerbot.deadline = self.pokerbot.time_budget.deadline(game_state, round_state, self.received)
+                if self.tracer is not None:
+                    action = self.tracer.trace(self.pokerbot.get_action, game_state, round_state, active)
+                else:
+                    action = self.pokerbot.get_action(game_state, round_state, active)
                 self.send(action)
+                if self.speculator is not None and is_legal(round_state, action):
+                    # the state the opponent now acts in; proceeding a discard
+                    # moves the card in place, so do it on copies of the cards
+                    speculative_state = round_state
+                    if isinstance(action, DiscardAction):
+                        speculative_state = RoundState(round_state.button, round_state.street, round_state.pips,
+                                                       round_state.stacks, [list(hand) for hand in round_state.hands],
+                                                       list(round_state.board), round_state.previous_state)
+                    self.speculator.start(game_state, speculative_state.proceed(action), active)
+            if self.profiler is not None:
+                self.profiler.pause()
+
+
+def is_legal(round_state, action):
+    '''
+    Returns whether the engine will accept action in round_state, as it
+    checks it: an illegal action is replaced by a check or fold, so the
+    bot's own action must not be proceeded.
+    '''
+    if type(action) not in round_state.legal_actions():
+        return False
+    if isinstance(action, RaiseAction):
+        min_raise, max_raise = round_state.raise_bounds()
+        return isinstance(action.amount, int) and min_raise <= action.amount <= max_raise
+    if isinstance(action, DiscardAction):
+        return isinstance(action.card, int) and 0 <= action.card < len(round_state.hands[round_state.button % 2])
+    return True
 
 
 def parse_args():
@@ -141,7 +188,13 @@ def run_bot(pokerbot, args):
         print('Could not connect to {}:{}'.format(args.host, args.port))
         return
     socketfile = sock.makefile('rw')
-    runner = Runner(pokerbot, socketfile)
+    runner = Runner(pokerbot, socketfile, profiler.from_environment(), tracer.from_environment())
     runner.run()
+    if runner.speculator is not None:
+        runner.speculator.stop()
+    if runner.profiler is not None:
+        runner.profiler.write()
+    if runner.tracer is not None:
+        runner.tracer.close()
     socketfile.close()
     sock.close()
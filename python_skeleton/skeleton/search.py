@@ -0,0 +1,231 @@
+'''
+A compact, undo-able round state for tree search inside a bot.
+
+RoundState.proceed builds a new object per action and mutates the shared
+hand and board lists, so a bot cannot use it to explore hypothetical lines
+without corrupting its real state. SearchState applies moves in place with
+make() and restores them exactly with unmake(), following the same rules
+as RoundState, so lookahead over thousands of nodes only costs one small
+undo record per move.
+
+Moves are integers: FOLD, CALL, CHECK, DISCARD + i to discard hand[i] and
+RAISE + amount to raise to amount chips. Cards use the integer encoding of
+skeleton.cards.
+'''
+from .actions import FoldAction, CallAction, CheckAction, RaiseAction, DiscardAction
+from .cards import encode
+from .states import STARTING_STACK, BIG_BLIND
+
+FOLD = 0
+CALL = 1
+CHECK = 2
+DISCARD = 3
+RAISE = 8
+
+FOLD_BIT = 1
+CALL_BIT = 2
+CHECK_BIT = 4
+DISCARD_BIT = 8
+RAISE_BIT = 16
+
+# legal action masks for a betting street, indexed by 2 * (continue_cost > 0) + raising_allowed
+BETTING_MASKS = (
+    CHECK_BIT | FOLD_BIT,
+    CHECK_BIT | RAISE_BIT | FOLD_BIT,
+    FOLD_BIT | CALL_BIT,
+    FOLD_BIT | CALL_BIT | RAISE_BIT,
+)
+
+IN_PROGRESS = 0
+FOLDED = 1
+SHOWDOWN = 2
+
+# number of runout cards dealt when a street starts
+DEALT_ON_STREET = {2: 2, 5: 1, 6: 1}
+
+
+class SearchState():
+    '''
+    Mutable round state with make/unmake transitions.
+    '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'hands', 'board', 'runout', 'dealt',
+                 'status', 'winner', 'history')
+
+    def __init__(self, button, street, pips, stacks, hands, board, runout=()):
+        self.button = button
+        self.street = street
+        self.pips = list(pips)
+        self.stacks = list(stacks)
+        self.hands = [list(hands[0]), list(hands[1])]
+        self.board = list(board)
+        self.runout = tuple(runout)  # future board cards in the order they are dealt
+        self.dealt = 0
+        self.status = IN_PROGRESS
+        self.winner = None
+        self.history = []
+
+    @classmethod
+    def from_round_state(cls, round_state, runout=()):
+        '''
+        Builds a SearchState from the skeleton's RoundState.
+
+        runout optionally lists future board cards, as integers, to deal when
+        the flop, turn and river start; otherwise the board stays as it is.
+        '''
+        hands = [encode(round_state.hands[0]), encode(round_state.hands[1])]
+        return cls(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                   hands, encode(round_state.board), runout)
+
+    def legal_mask(self):
+        '''
+        Returns the active player's legal actions as a bitmask of *_BIT flags.
+        '''
+        if self.status != IN_PROGRESS:
+            return 0
+        active = self.button & 1
+        if self.street == 2 or self.street == 3:
+            return DISCARD_BIT if active != self.street & 1 else CHECK_BIT
+        continue_cost = self.pips[1-active] - self.pips[active]
+        if continue_cost == 0:
+            raising_allowed = self.stacks[0] != 0 and self.stacks[1] != 0
+        else:
+            raising_allowed = continue_cost != self.stacks[active] and self.stacks[1-active] != 0
+        return BETTING_MASKS[2 * (continue_cost > 0) + raising_allowed]
+
+    def raise_bounds(self):
+        '''
+        Returns a tuple of the minimum and maximum legal raises.
+        '''
+        active = self.button & 1
+        continue_cost = self.pips[1-active] - self.pips[active]
+        max_contribution = min(self.stacks[active], self.stacks[1-active] + continue_cost)
+        min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
+        return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+
+    def legal_moves(self, raise_fractions=(0., 1.)):
+        '''
+        Lists the legal moves, with raises at the given fractions of the way
+        from the minimum to the maximum legal raise.
+        '''
+        mask = self.legal_mask()
+        moves = []
+        if mask & DISCARD_BIT:
+            moves.extend(DISCARD + i for i in range(len(self.hands[self.button & 1]) or 3))
+        if mask & CHECK_BIT:
+            moves.append(CHECK)
+        if mask & CALL_BIT:
+            moves.append(CALL)
+        if mask & RAISE_BIT:
+            min_raise, max_raise = self.raise_bounds()
+            amounts = sorted({int(min_raise + fraction * (max_raise - min_raise)) for fraction in raise_fractions})
+            moves.extend(RAISE + amount for amount in amounts)
+        if mask & FOLD_BIT:
+            moves.append(FOLD)
+        return moves
+
+    def make(self, move):
+        '''
+        Applies a move in place, recording how to undo it.
+        '''
+        active = self.button & 1
+        self.history.append((move, self.button, self.street, self.pips[0], self.pips[1],
+                             self.stacks[0], self.stacks[1], len(self.board), self.dealt))
+        if move >= RAISE:
+            amount = move - RAISE
+            self.stacks[active] -= amount - self.pips[active]
+            self.pips[active] = amount
+            self.button += 1
+        elif move >= DISCARD:
+            hand = self.hands[active]
+            if hand:
+                self.board.append(hand.pop(move - DISCARD))
+            self.button = 1 - active
+        elif move == FOLD:
+            self.status = FOLDED
+            self.winner = 1 - active
+        elif move == CALL:
+            if self.button == 0:  # sb calls bb
+                self.button = 1
+                self.pips[0] = self.pips[1] = BIG_BLIND
+                self.stacks[0] = self.stacks[1] = STARTING_STACK - BIG_BLIND
+            else:  # both players acted
+                self.stacks[active] -= self.pips[1-active] - self.pips[active]
+                self.pips[active] = self.pips[1-active]
+                self._proceed_street()
+        elif (self.street == 0 and self.button > 0) or self.button > 1 or self.street == 2 or self.street == 3:
+            self._proceed_street()  # both players checked
+        else:
+            self.button += 1
+
+    def _proceed_street(self):
+        if self.street == 6:
+            self.status = SHOWDOWN
+            return
+        if self.street == 0:
+            self.street, self.button = 2, 1
+        elif self.street == 2:
+            self.street, self.button = 3, 0
+        else:
+            self.street, self.button = self.street + 1, 1
+        self.pips[0] = self.pips[1] = 0
+        count = DEALT_ON_STREET.get(self.street, 0)
+        if count and self.dealt + count <= len(self.runout):
+            self.board.extend(self.runout[self.dealt:self.dealt + count])
+            self.dealt += count
+
+    def unmake(self):
+        '''
+        Reverts the most recent make().
+        '''
+        (move, self.button, self.street, self.pips[0], self.pips[1],
+         self.stacks[0], self.stacks[1], board_size, self.dealt) = self.history.pop()
+        if DISCARD <= move < RAISE and len(self.board) > board_size:
+            self.hands[self.button & 1].insert(move - DISCARD, self.board[board_size])
+        del self.board[board_size:]
+        self.status = IN_PROGRESS
+        self.winner = None
+
+    def delta(self, winner):
+        '''
+        Returns player 0's payoff when winner (0, 1, or 2 for a split) takes the pot.
+        '''
+        if winner == 0:
+            return STARTING_STACK - self.stacks[1]
+        if winner == 1:
+            return self.stacks[0] - STARTING_STACK
+        return 0
+
+    def showdown_winner(self):
+        '''
+        Evaluates both known hands at showdown; returns 0, 1, or 2 for a split.
+        '''
+        import pkrbot  # only needed when both hands are known
+        scores = []
+        for hand in self.hands:
+            cards = self.board + hand
+            scores.append(pkrbot.evaluate([card >> 2 for card in cards], [card & 3 for card in cards]))
+        return 0 if scores[0] > scores[1] else (1 if scores[0] < scores[1] else 2)
+
+
+def to_action(move):
+    '''
+    Converts a move into the action to return from get_action.
+    '''
+    if move >= RAISE:
+        return RaiseAction(move - RAISE)
+    if move >= DISCARD:
+        return DiscardAction(move - DISCARD)
+    return (FoldAction, CallAction, CheckAction)[move]()
+
+
+def from_action(action):
+    '''
+    Converts an action into a move.
+    '''
+    if isinstance(action, RaiseAction):
+        return RAISE + action.amount
+    if isinstance(action, DiscardAction):
+        return DISCARD + action.card
+    if isinstance(action, FoldAction):
+        return FOLD
+    return CALL if isinstance(action, CallAction) else CHECK
@@ -0,0 +1,66 @@
+'''
+Runs a bot's speculative work while it waits on the engine.
+
+After each response the Runner hands the bot's speculate method to a
+Speculator, which runs it on a long-lived worker thread while the main
+thread blocks on the socket, off the bot's game clock. When the next
+message arrives the Runner cancels it: the cancelled event is set and the
+Runner waits for speculate to return before handling the message, so
+speculate must check cancelled.is_set() often and return promptly.
+
+Because of the GIL the worker only runs while the main thread is blocked,
+which is exactly while the opponent thinks. Work that must keep going
+during the bot's own turn belongs in a separate process.
+'''
+import queue
+import threading
+import traceback
+
+
+class Speculator():
+    '''
+    A worker thread running one cancellable speculative job at a time.
+    '''
+
+    def __init__(self, speculate):
+        self.speculate = speculate
+        self.jobs = queue.Queue()
+        self.cancelled = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                if not self.cancelled.is_set():
+                    self.speculate(*job, self.cancelled)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.idle.set()
+
+    def start(self, game_state, round_state, active):
+        '''
+        Starts speculating from the given state.
+        '''
+        self.cancel()
+        self.cancelled.clear()
+        self.idle.clear()
+        self.jobs.put((game_state, round_state, active))
+
+    def cancel(self):
+        '''
+        Cancels the running job, if any, and waits for it to return.
+        '''
+        self.cancelled.set()
+        self.idle.wait()
+
+    def stop(self):
+        self.cancel()
+        self.jobs.put(None)
+        self.worker.join()
@@ -0,0 +1,177 @@
+'''
+Hand strength and potential of our two kept cards, in NumPy batches.
+
+StrengthEstimator.features(hole, board) returns the classic features for
+sizing bets on real strength rather than on a fixed multiple of the
+minimum raise:
+
+    hs      share of opponent holdings we beat now (ties count half)
+    ppot    chance that a hand behind or tied now ends up ahead
+    npot    chance that a hand ahead or tied now ends up behind
+    ehs     effective strength, hs * (1 - npot) + (1 - hs) * ppot
+    ehs2    expected square of our final-board strength, which rewards
+            draws over hands that stay middling on every runout
+
+The board is round_state.board after our discard, 3 to 6 cards; cards still
+to come, including a discard the opponent has not made yet, are runouts
+like the turn and river, which assumes the opponent's discard is random.
+Each runout scores our hand against every live opponent holding with one
+evaluate_words call over the HOLE_COMBOS words, so the features are exact
+over the opponent's holdings and sampled over runouts: all of them when
+there are at most runouts (from the turn on), else runouts random ones,
+drawn batch_size at a time until the deadline. On a complete board hs is
+exact and the potentials are 0.
+
+An optional opponent range is an array of 1326 weights over HOLE_COMBOS,
+e.g. OpponentRange.kept(). Results without a range are cached under the
+spot's suit-isomorphic key in an LRU of cache_size.
+
+    self.strength = StrengthEstimator()
+    ...
+    features = self.strength.features(my_cards, board_cards, deadline=self.deadline)
+    pot = 2 * STARTING_STACK - sum(round_state.stacks)
+    if features.ehs > 0.8:
+        return RaiseAction(min(min_raise + int(features.ehs2 * pot), max_raise))
+'''
+import itertools
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from .equity import BOARD_SIZE, COMBO_WORDS, as_ints, canonical, live_combos
+from .handeval import CARD_BITS, evaluate_words
+
+DEFAULT_RUNOUTS = 128
+BATCH_SIZE = 32
+CACHE_SIZE = 4096
+AHEAD = 0
+TIED = 1
+BEHIND = 2
+
+HandStrength = namedtuple('HandStrength', ['hs', 'ppot', 'npot', 'ehs', 'ehs2', 'runouts'])
+
+
+def outcomes(hero_values, villain_values):
+    '''
+    Returns AHEAD, TIED or BEHIND for our values against the villains', broadcasting.
+    '''
+    return np.sign(villain_values - hero_values).astype(np.int64) + TIED
+
+
+def runout_total(live, missing):
+    '''
+    Returns the number of ways to deal missing board cards from live cards.
+    '''
+    total = 1
+    for i in range(missing):
+        total = total * (live - i) // (i + 1)
+    return total
+
+
+class StrengthEstimator():
+    '''
+    Computes HandStrength features, with an LRU cache of results.
+
+    runouts: the most runouts to score; more than this are sampled.
+    '''
+
+    def __init__(self, runouts=DEFAULT_RUNOUTS, batch_size=BATCH_SIZE, cache_size=CACHE_SIZE, seed=None):
+        self.runouts = runouts
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.rng = np.random.default_rng(seed)
+        self.cache = OrderedDict()
+
+    def features(self, hole, board, opp_range=None, deadline=None):
+        '''
+        Returns the HandStrength of two hole cards on board.
+
+        Scoring stops early, after at least one batch of runouts, if deadline
+        (a skeleton.budget.Deadline) expires; a shortened result is returned,
+        with its runouts field saying so, but not cached.
+        '''
+        hole, board = as_ints(hole), as_ints(board)
+        if opp_range is not None:
+            return self.compute(hole, board, opp_range, deadline)
+        (key_hole, key_board), _ = canonical(hole, board)
+        key = (key_hole, key_board, self.runouts)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.compute(list(key_hole), list(key_board), None, deadline)
+            if result.runouts >= self.runout_count(hole + board, BOARD_SIZE - len(board)):
+                self.cache[key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return result
+
+    def compute(self, hole, board, opp_range=None, deadline=None):
+        '''
+        Computes the HandStrength for hole and board given as integers.
+        '''
+        if len(hole) != 2 or not 3 <= len(board) <= BOARD_SIZE:
+            raise ValueError('expected 2 hole cards and a board of 3 to 6 cards')
+        weights = live_combos(hole + board).astype(float)
+        if opp_range is not None:
+            weights *= opp_range
+        if weights.sum() <= 0.:
+            raise ValueError('no opponent holding in the range is possible')
+        live = weights > 0.
+        weights = weights[live]
+        opp_words = COMBO_WORDS[live]
+        board_word = int(CARD_BITS[board].sum())
+        hero_word = board_word + int(CARD_BITS[hole].sum())
+
+        now = outcomes(evaluate_words(hero_word), evaluate_words(opp_words + board_word))
+        hs = float(weights @ ((now == AHEAD) + (now == TIED) / 2) / weights.sum())
+        missing = BOARD_SIZE - len(board)
+        if missing == 0:
+            return HandStrength(hs, 0., 0., hs, hs * hs, 0)
+
+        # transitions[i, j]: weight of holdings going from outcome i now to j at showdown
+        transitions = np.zeros((3, 3))
+        squares = 0.
+        count = 0
+        for runout_words in self.runout_batches(hole + board, missing):
+            valid = (opp_words & runout_words[:, None]) == 0
+            final = outcomes(evaluate_words(hero_word + runout_words)[:, None],
+                             evaluate_words(opp_words + (board_word + runout_words[:, None])))
+            mass = np.where(valid, weights, 0.)
+            flat = (now * 3 + final).ravel()
+            transitions += np.bincount(flat, weights=mass.ravel(), minlength=9).reshape(3, 3)
+            totals = np.maximum(mass.sum(axis=1), 1e-12)
+            strengths = (mass * ((final == AHEAD) + (final == TIED) / 2)).sum(axis=1) / totals
+            squares += float((strengths * strengths).sum())
+            count += len(runout_words)
+            if deadline is not None and deadline.expired():
+                break
+
+        rows = transitions.sum(axis=1)
+        behind = rows[BEHIND] + rows[TIED] / 2
+        ahead = rows[AHEAD] + rows[TIED] / 2
+        ppot = (transitions[BEHIND, AHEAD] + transitions[BEHIND, TIED] / 2 + transitions[TIED, AHEAD] / 2) / behind if behind > 0. else 0.
+        npot = (transitions[AHEAD, BEHIND] + transitions[TIED, BEHIND] / 2 + transitions[AHEAD, TIED] / 2) / ahead if ahead > 0. else 0.
+        ehs = hs * (1 - npot) + (1 - hs) * ppot
+        return HandStrength(hs, float(ppot), float(npot), float(ehs), squares / count, count)
+
+    def runout_count(self, dead, missing):
+        '''
+        Returns the number of runouts runout_batches yields in full.
+        '''
+        return min(runout_total(52 - len(dead), missing), self.runouts) if missing else 0
+
+    def runout_batches(self, dead, missing):
+        '''
+        Yields arrays of runout words completing the board: every runout when
+        there are at most self.runouts, else self.runouts random ones.
+        '''
+        live = np.setdiff1d(np.arange(52), dead)
+        if runout_total(len(live), missing) <= self.runouts:
+            combos = np.array(list(itertools.combinations(range(len(live)), missing)), dtype=np.int64)
+            words = CARD_BITS[live[combos]].sum(axis=1)
+        else:
+            keys = self.rng.random((self.runouts, len(live)))
+            words = CARD_BITS[live[np.argpartition(keys, missing, axis=1)[:, :missing]]].sum(axis=1)
+        for start in range(0, len(words), self.batch_size):
+            yield words[start:start + self.batch_size]
@@ -0,0 +1,99 @@
+'''
+Board texture features by table lookup.
+
+Decisions about discards and bet sizes keep asking the same questions about
+the board: how many cards of each suit, whether ranks are paired, how close
+it is to a straight and which ranks would complete one. All of them depend
+on the board only through its suit counts, its rank multiplicities and its
+13-bit mask of distinct ranks, so they are read from the board's 52-bit
+word (see skeleton.handeval) with a few bit operations and lookups into
+dense 8192-entry tables, the same for every suit-isomorphic board of 2 to
+6 cards. textures computes a TEXTURE record for every word in an array:
+
+    cards       number of cards
+    suits       cards of each suit
+    max_suit    cards of the most common suit
+    paired      ranks appearing at least twice
+    trips       ranks appearing at least three times
+    quads       ranks appearing four times
+    run         longest run of consecutive ranks, the ace counting high only
+    needs       fewest more ranks that make a straight, 0 if the board holds one
+    completing  mask of the ranks missing from the straights the board holds
+                three or more ranks of, i.e. the ranks a two-card holding
+                needs to make a straight
+
+For example
+
+    t = texture(['8h', '9c', 'Td'])
+    if t['run'] >= 3 or t['max_suit'] >= 3:
+        ...
+'''
+import numpy as np
+
+from .cards import encode
+from .handeval import CARD_BITS, MASKS, POPCOUNT, RANK_BITS, rank_masks
+
+# the ten five-rank windows a straight can use, the wheel first
+WINDOWS = np.array([RANK_BITS[[12, 0, 1, 2, 3]].sum()] + [RANK_BITS[top - 4:top + 1].sum() for top in range(4, 13)])
+
+RANK_TEXTURE = np.dtype([('run', np.uint8), ('needs', np.uint8), ('completing', np.uint16)])
+TEXTURE = np.dtype([
+    ('cards', np.uint8),
+    ('suits', np.uint8, (4,)),
+    ('max_suit', np.uint8),
+    ('paired', np.uint8),
+    ('trips', np.uint8),
+    ('quads', np.uint8),
+    ('run', np.uint8),
+    ('needs', np.uint8),
+    ('completing', np.uint16),
+])
+
+
+def _build_rank_textures():
+    '''
+    Returns the straight features of every 13-bit mask of distinct ranks.
+    '''
+    table = np.zeros(1 << 13, dtype=RANK_TEXTURE)
+    run = np.zeros(1 << 13, dtype=np.int64)
+    longest = np.zeros(1 << 13, dtype=np.int64)
+    for r in range(13):
+        run = np.where(MASKS & (1 << r), run + 1, 0)
+        longest = np.maximum(longest, run)
+    covered = POPCOUNT[MASKS[:, None] & WINDOWS[None, :]]
+    completing = np.bitwise_or.reduce(np.where(covered >= 3, WINDOWS & ~MASKS[:, None], 0), axis=1)
+    table['run'] = longest
+    table['needs'] = 5 - covered.max(axis=1)
+    table['completing'] = completing
+    return table
+
+
+RANK_TEXTURES = _build_rank_textures()
+
+
+def textures(words):
+    '''
+    Returns the TEXTURE record of every board word in an array of any shape.
+    '''
+    words = np.asarray(words, dtype=np.int64)
+    (singles, pairs, trips, quads), suited = rank_masks(words)
+    suits = POPCOUNT[suited]
+    ranks = RANK_TEXTURES[singles]
+    result = np.zeros(words.shape, dtype=TEXTURE)
+    result['cards'] = suits.sum(axis=-1)
+    result['suits'] = suits
+    result['max_suit'] = suits.max(axis=-1)
+    result['paired'] = POPCOUNT[pairs]
+    result['trips'] = POPCOUNT[trips]
+    result['quads'] = POPCOUNT[quads]
+    for name in RANK_TEXTURE.names:
+        result[name] = ranks[name]
+    return result
+
+
+def texture(board):
+    '''
+    Returns the TEXTURE record of one board, given as card strings or ints.
+    '''
+    board = encode(board) if board and isinstance(board[0], str) else list(board)
+    return textures(int(CARD_BITS[board].sum()))[()]
@@ -0,0 +1,33 @@
+'''
+Integer encoding of cards for fast bot-side computation.
+
+Cards are numbered 0-51 as 4 * rank + suit, the same order as pkrbot's deck,
+with ranks 0-12 for 2 through A and suits 0-3 for c, d, h, s.
+'''
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+
+CARD_STRINGS = [rank + suit for rank in RANKS for suit in SUITS]
+CARD_INDEX = {card: i for i, card in enumerate(CARD_STRINGS)}
+
+
+def encode(cards):
+    '''
+    Converts card strings such as 'As' to integers.
+    '''
+    return [CARD_INDEX[card] for card in cards]
+
+
+def decode(cards):
+    '''
+    Converts integer cards back to strings.
+    '''
+    return [CARD_STRINGS[card] for card in cards]
+
+
+def rank(card):
+    return card >> 2
+
+
+def suit(card):
+    return card & 3
@@ -7,6 +7,7 @@ from .actions import FoldAction, CallAction, CheckAction, RaiseAction, DiscardAc
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from .bot import Bot
+from . import profiler, tracer
 
 
 class Runner():
@@ -14,9 +15,11 @@ class Runner():
     Interacts with the engine.
     '''
 
-    def __init__(self, pokerbot, socketfile):
+    def __init__(self, pokerbot, socketfile, profiler=None, tracer=None):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.profiler = profiler
+        self.tracer = tracer
 
     def receive(self):
         '''
@@ -54,6 +57,8 @@ class Runner():
         active = 0
         round_flag = True
         for packet in self.receive():
+            if self.profiler is not None:
+                self.profiler.resume()
             for clause in packet:
                 if clause[0] == 'T':
                     game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
@@ -117,8 +122,13 @@ class Runner():
                 self.send(CheckAction())
             else:
                 ##assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
+                if self.tracer is not None:
+                    action = self.tracer.trace(self.pokerbot.get_action, game_state, round_state, active)
+                else:
+                    action = self.pokerbot.get_action(game_state, round_state, active)
                 self.send(action)
+            if self.profiler is not None:
+                self.profiler.pause()
 
 
 def parse_args():
@@ -141,7 +151,11 @@ def run_bot(pokerbot, args):
         print('Could not connect to {}:{}'.format(args.host, args.port))
         return
     socketfile = sock.makefile('rw')
-    runner = Runner(pokerbot, socketfile)
+    runner = Runner(pokerbot, socketfile, profiler.from_environment(), tracer.from_environment())
     runner.run()
+    if runner.profiler is not None:
+        runner.profiler.write()
+    if runner.tracer is not None:
+        runner.tracer.close()
     socketfile.close()
     sock.close()
@@ -0,0 +1,179 @@
+'''
+Per-decision tracing for tuning a pokerbot's worst-case latency.
+
+When enabled, the Runner passes every get_action call through a Tracer,
+which appends one fixed-size binary record per decision to a trace file:
+the state the bot saw (round, street, seat, pips, stacks, hand and board),
+the action it chose, the wall and CPU time it took, the game clock left
+and the net change in allocated memory blocks.
+
+With an allocation threshold, tracemalloc runs for the whole game and the
+tracer snapshots the heap before each decision; decisions slower than the
+threshold are diffed against their snapshot to count the blocks they
+allocated, and their top allocation sites are written to <trace>.alloc.txt.
+Snapshots are not free, so only use a threshold when hunting allocations.
+
+The engine enables tracing through the POKERBOT_TRACE_PATH and
+POKERBOT_TRACE_ALLOC_THRESHOLD environment variables. To list the slowest
+decisions of a trace, run from the bot's directory:
+
+    python -m skeleton.tracer <name>.trace [--slowest 20]
+'''
+import argparse
+import os
+import struct
+import sys
+import time
+import tracemalloc
+
+from .actions import FoldAction, CallAction, RaiseAction, DiscardAction
+from .cards import CARD_INDEX, CARD_STRINGS
+
+MAGIC = b'PBTRACE1'
+NO_CARD = 0xFF
+# round, street, active, pips, stacks, hand, board, action code and value,
+# wall and cpu microseconds, game clock, net blocks, blocks allocated
+RECORD = struct.Struct('<HBB2H2H3s6scHIIfiI')
+FIELDS = ('round_num', 'street', 'active', 'pip', 'opp_pip', 'stack', 'opp_stack', 'hand', 'board',
+          'action', 'value', 'wall_us', 'cpu_us', 'game_clock', 'blocks', 'allocations')
+ALLOCATION_SITES = 10
+
+
+def pack_cards(cards, size):
+    '''
+    Packs card strings into size bytes of card indices, padded with NO_CARD.
+    '''
+    indices = [CARD_INDEX.get(card, NO_CARD) for card in cards[:size]]
+    return bytes(indices + [NO_CARD] * (size - len(indices)))
+
+
+def unpack_cards(packed):
+    return [CARD_STRINGS[card] for card in packed if card != NO_CARD]
+
+
+def encode_action(action):
+    '''
+    Returns the one-letter code and value (raise amount or discard index) of an action.
+    '''
+    if isinstance(action, RaiseAction):
+        return b'R', action.amount
+    if isinstance(action, DiscardAction):
+        return b'D', action.card
+    if isinstance(action, FoldAction):
+        return b'F', 0
+    return (b'C', 0) if isinstance(action, CallAction) else (b'K', 0)
+
+
+class Tracer():
+    '''
+    Times each decision and appends its record to a trace file.
+    '''
+
+    def __init__(self, path, alloc_threshold=None):
+        self.path = path
+        self.alloc_threshold = alloc_threshold
+        self.trace_file = open(path, 'wb')
+        self.trace_file.write(MAGIC)
+        self.alloc_file = None
+        if alloc_threshold is not None:
+            tracemalloc.start()
+            self.alloc_file = open(path + '.alloc.txt', 'w')
+
+    def trace(self, get_action, game_state, round_state, active):
+        '''
+        Calls get_action, records the decision and returns its action.
+        '''
+        snapshot = tracemalloc.take_snapshot() if self.alloc_file is not None else None
+        start_blocks = sys.getallocatedblocks()
+        start_cpu = time.thread_time()
+        start_time = time.perf_counter()
+        action = get_action(game_state, round_state, active)
+        wall_time = time.perf_counter() - start_time
+        cpu_time = time.thread_time() - start_cpu
+        blocks = sys.getallocatedblocks() - start_blocks
+        allocations = 0
+        if snapshot is not None and wall_time > self.alloc_threshold:
+            allocations = self.record_allocations(snapshot, game_state, round_state, wall_time)
+        code, value = encode_action(action)
+        self.trace_file.write(RECORD.pack(
+            game_state.round_num, round_state.street, active,
+            round_state.pips[active], round_state.pips[1-active],
+            round_state.stacks[active], round_state.stacks[1-active],
+            pack_cards(round_state.hands[active], 3), pack_cards(round_state.board, 6),
+            code, value, min(int(wall_time * 1e6), 0xFFFFFFFF), min(int(cpu_time * 1e6), 0xFFFFFFFF),
+            game_state.game_clock, blocks, allocations))
+        return action
+
+    def record_allocations(self, snapshot, game_state, round_state, wall_time):
+        '''
+        Writes the top allocation sites of a slow decision; returns the number of blocks it allocated.
+        '''
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+        differences = after.compare_to(snapshot.filter_traces(filters), 'lineno')
+        allocations = sum(difference.count_diff for difference in differences if difference.count_diff > 0)
+        self.alloc_file.write('round {} street {}: {:.3f} ms, {} blocks allocated\n'.format(
+            game_state.round_num, round_state.street, 1000 * wall_time, allocations))
+        for difference in differences[:ALLOCATION_SITES]:
+            self.alloc_file.write('    {}\n'.format(difference))
+        return allocations
+
+    def close(self):
+        self.trace_file.close()
+        if self.alloc_file is not None:
+            self.alloc_file.close()
+            tracemalloc.stop()
+
+
+def from_environment():
+    '''
+    Returns the tracer requested by the engine through the environment, or None.
+    '''
+    path = os.environ.get('POKERBOT_TRACE_PATH')
+    if not path:
+        return None
+    threshold = os.environ.get('POKERBOT_TRACE_ALLOC_THRESHOLD')
+    return Tracer(path, float(threshold) if threshold else None)
+
+
+def read_trace(path):
+    '''
+    Generator of the decisions in a trace file, as dictionaries keyed by FIELDS.
+    '''
+    with open(path, 'rb') as trace_file:
+        if trace_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + ' is not a decision trace')
+        while True:
+            data = trace_file.read(RECORD.size)
+            if len(data) < RECORD.size:
+                return
+            record = dict(zip(FIELDS, RECORD.unpack(data)))
+            record['hand'] = unpack_cards(record['hand'])
+            record['board'] = unpack_cards(record['board'])
+            record['action'] = record['action'].decode()
+            yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m skeleton.tracer', description='Lists the slowest decisions in a trace.')
+    parser.add_argument('path', help='trace file')
+    parser.add_argument('--slowest', type=int, default=20, help='number of decisions to list')
+    args = parser.parse_args()
+    records = list(read_trace(args.path))
+    if not records:
+        print('No decisions traced')
+        return
+    wall_times = sorted(record['wall_us'] for record in records)
+    print('{} decisions: median {} us, p99 {} us, max {} us, {:.3f} s total'.format(
+        len(records), wall_times[len(wall_times) // 2], wall_times[min(len(wall_times) - 1, len(wall_times) * 99 // 100)],
+        wall_times[-1], sum(wall_times) / 1e6))
+    for record in sorted(records, key=lambda record: record['wall_us'], reverse=True)[:args.slowest]:
+        if record['action'] not in 'RD':
+            record['value'] = ''
+        print('round {round_num:4d} street {street} {wall_us:8d} us wall {cpu_us:8d} us cpu '
+              '{blocks:+6d} blocks {allocations:6d} allocs  clock {game_clock:7.3f}  '
+              'hand {hand} board {board} pips {pip}/{opp_pip} stacks {stack}/{opp_stack} -> {action}{value}'.format(**record))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+'''
+Hand-versus-hand win and tie matrices for offline strategy analysis.
+
+For a board of 4 to 6 cards (after both discards), matchup_matrices
+returns two 1326 x 1326 float32 matrices over the two-card holdings of
+skeleton.equity.HOLE_COMBOS: wins[i, j] is the probability that holding i
+beats holding j once the board is complete, and ties[i, j] that they split.
+Each runout evaluates every holding once and compares the value vectors by
+broadcasting, instead of evaluating every pair. Runouts are enumerated (47
+on the turn, 1128 after the discards, by default) or sampled when there are
+more than --runouts. Pairs of holdings that share a card, or hold a board card, are
+0 in both matrices.
+
+Enumerated matrices are cached per suit-isomorphic board in --cache-dir and
+permuted back for the actual suits, so every relabeling of a board is
+computed once; sampled ones depend on the seed and are not cached.
+range_equity weighs a matrix by two ranges, e.g. to measure how often one
+strategy's holdings are ahead of another's on a street.
+
+Usage:
+    python range_equity.py 8h 2h Kc 3d 7s [--hand Th9h] [--runouts 1000] [--cache-dir range_cache]
+'''
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+from python_skeleton.skeleton.cards import encode, decode
+from python_skeleton.skeleton.equity import COMBO_WORDS, HOLE_COMBOS, BOARD_SIZE, suit_relabeling
+from python_skeleton.skeleton.handeval import CARD_BITS, evaluate_words
+
+DEFAULT_RUNOUTS = 1128  # every runout of the 4-card board after the discards
+CACHE_DIR = 'range_cache'
+
+PAIR_INDEX = np.zeros((52, 52), dtype=np.int64)
+PAIR_INDEX[HOLE_COMBOS[:, 0], HOLE_COMBOS[:, 1]] = np.arange(len(HOLE_COMBOS))
+PAIR_INDEX[HOLE_COMBOS[:, 1], HOLE_COMBOS[:, 0]] = np.arange(len(HOLE_COMBOS))
+# holdings that share a card can never meet
+DISJOINT = (COMBO_WORDS[:, None] & COMBO_WORDS[None, :]) == 0
+
+
+def runout_count(board):
+    '''
+    Returns the number of runouts completing the board.
+    '''
+    live = 52 - len(board)
+    total = 1
+    for i in range(BOARD_SIZE - len(board)):
+        total = total * (live - i) // (i + 1)
+    return total
+
+
+def runouts(board, max_runouts=DEFAULT_RUNOUTS, seed=None):
+    '''
+    Returns an (n, 6 - len(board)) array of the cards completing the board:
+    every runout, or max_runouts random ones when there are more.
+    '''
+    live = np.setdiff1d(np.arange(52), board)
+    missing = BOARD_SIZE - len(board)
+    total = runout_count(board)
+    if total <= max_runouts:
+        return np.array(list(itertools.combinations(live, missing)), dtype=np.int64).reshape(total, missing)
+    rng = np.random.default_rng(seed)
+    return live[np.argsort(rng.random((max_runouts, len(live))), axis=1)[:, :missing]]
+
+
+def matchup_matrices(board, max_runouts=DEFAULT_RUNOUTS, seed=None):
+    '''
+    Computes the win and tie matrices of every holding against every other on board.
+    '''
+    board = list(board)
+    board_word = int(CARD_BITS[board].sum())
+    wins = np.zeros((len(HOLE_COMBOS), len(HOLE_COMBOS)), dtype=np.float32)
+    ties = np.zeros_like(wins)
+    counts = np.zeros_like(wins)
+    for runout in runouts(board, max_runouts, seed):
+        dealt = board_word + int(CARD_BITS[runout].sum())
+        live = (COMBO_WORDS & dealt) == 0
+        values = evaluate_words(COMBO_WORDS + dealt)
+        valid = live[:, None] & live[None, :] & DISJOINT
+        wins += valid & (values[:, None] > values[None, :])
+        ties += valid & (values[:, None] == values[None, :])
+        counts += valid
+    np.divide(wins, counts, out=wins, where=counts > 0)
+    np.divide(ties, counts, out=ties, where=counts > 0)
+    return wins, ties
+
+
+def canonical_board(board):
+    '''
+    Returns the suit-isomorphic form of board and the canonical index of every holding.
+    '''
+    relabel = suit_relabeling([], board)
+    suits = np.array([relabel[s] for s in range(4)])
+    mapped = (HOLE_COMBOS & ~3) | suits[HOLE_COMBOS & 3]
+    return sorted((c & ~3) | relabel[c & 3] for c in board), PAIR_INDEX[mapped[:, 0], mapped[:, 1]]
+
+
+def cached_matchup_matrices(board, cache_dir=CACHE_DIR, max_runouts=DEFAULT_RUNOUTS, seed=None):
+    '''
+    matchup_matrices through a cache of canonical boards on disk, for boards
+    whose runouts are all enumerated.
+    '''
+    canonical, index = canonical_board(list(board))
+    if runout_count(canonical) > max_runouts:
+        wins, ties = matchup_matrices(canonical, max_runouts, seed)
+        return wins[np.ix_(index, index)], ties[np.ix_(index, index)]
+    path = os.path.join(cache_dir, '{}.npz'.format(''.join(decode(canonical))))
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            wins, ties = cached['wins'], cached['ties']
+    else:
+        wins, ties = matchup_matrices(canonical, max_runouts, seed)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(path, wins=wins, ties=ties)
+    return wins[np.ix_(index, index)], ties[np.ix_(index, index)]
+
+
+def range_equity(hero_weights, villain_weights, wins, ties):
+    '''
+    Returns the equity of a range of holdings against another, given as weights over HOLE_COMBOS.
+
+    Pairs of holdings that cannot meet are left out and the rest renormalized.
+    '''
+    hero_weights = np.asarray(hero_weights, dtype=np.float32)
+    villain_weights = np.asarray(villain_weights, dtype=np.float32)
+    # a pair that can meet either wins, ties or loses (wins the other way round)
+    possible = hero_weights @ (wins + ties + wins.T) @ villain_weights
+    return float(hero_weights @ (wins + ties / 2) @ villain_weights / possible) if possible > 0 else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Computes hand-versus-hand matrices on a board.')
+    parser.add_argument('board', nargs='+', help='4 to 6 board cards, e.g. 8h 2h Kc 3d')
+    parser.add_argument('--hand', help='show this holding\'s equity against every other, e.g. Th9h')
+    parser.add_argument('--runouts', type=int, default=DEFAULT_RUNOUTS, help='most runouts to enumerate before sampling')
+    parser.add_argument('--seed', type=int, help='seed for sampled runouts')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='where matrices are cached')
+    parser.add_argument('--top', type=int, default=10, help='number of best holdings to list')
+    args = parser.parse_args()
+    board = encode(args.board)
+    if not 4 <= len(board) <= BOARD_SIZE:
+        parser.error('the board needs 4 to 6 cards')
+    start = time.perf_counter()
+    wins, ties = cached_matchup_matrices(board, args.cache_dir, args.runouts, args.seed)
+    print('Board {}: matrices in {:.2f} s'.format(' '.join(args.board), time.perf_counter() - start))
+    # every holding against a uniformly random one
+    possible = (wins + ties + wins.T).sum(axis=1)
+    equities = np.full(len(HOLE_COMBOS), np.nan)
+    np.divide((wins + ties / 2).sum(axis=1), possible, out=equities, where=possible > 0)
+    if args.hand:
+        i = PAIR_INDEX[tuple(encode([args.hand[:2], args.hand[2:]]))]
+        print('{} against a random holding: {:.4f}'.format(args.hand, equities[i]))
+    for i in np.argsort(np.nan_to_num(equities, nan=-1.))[::-1][:args.top]:
+        print('{:>6} {:.4f}'.format(''.join(decode(HOLE_COMBOS[i])), equities[i]))
+
+
+if __name__ == '__main__':
+    main()
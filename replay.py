@@ -0,0 +1,595 @@
+'''
+Deterministic replay of a game from its game log.
+
+The game log records every card that was dealt to the players, the board
+and every action, plus the seed that dealt the game's decks. From it this
+tool can
+    - rebuild the exact sequence of engine RoundStates of any round,
+    - load one pokerbot in-process, feed it the same messages it received
+      during the game (answering with the recorded actions) and re-ask it
+      for its action at any one recorded decision, optionally profiled,
+    - re-run a whole game with a pokerbot playing for real against the
+      opponent's recorded actions.
+
+Usage:
+    python replay.py gamelog.txt --round 12
+    python replay.py gamelog.txt --round 12 --query Avishai --decision 1 --bot ./python_v2 [--profile]
+    python replay.py gamelog.txt --rerun Avishai --bot ./python_v2 [--log-dir replay_logs]
+'''
+import argparse
+import cProfile
+import importlib.util
+import io
+import os
+import pstats
+import queue
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+import pkrbot
+from config import STARTING_STACK, BIG_BLIND, SMALL_BLIND, CONNECT_TIMEOUT, GAME_LOG_FILENAME
+from engine import (Game, Player, RoundState, TerminalState, FoldAction, CheckAction,
+                    RaiseAction, DiscardAction, DECODE, PCARDS, STATUS)
+from resource_usage import BotUsage
+
+HEADER = re.compile(r'^6\.9630 MIT Pokerbots - (.+) vs (.+)$')
+SEED = re.compile(r'^Deal seed: (\d+)$')
+ROUND = re.compile(r'^Round #(\d+), (.+) \((-?\d+)\), (.+) \((-?\d+)\)$')
+DEALT = re.compile(r'^(.+) dealt \[(.*)\]$')
+BOARD = re.compile(r'^(Flop|Discard 1|Discard 2|Turn|River) \[(.*)\], ')
+ACTION = re.compile(r'^(.+) (folds|calls|checks|raises to (\d+)|bets (\d+)|discards (\S+))$')
+AWARDED = re.compile(r'^(.+) awarded (-?\d+)$')
+
+CARDS = {str(card): card for card in pkrbot.Deck().cards}
+
+# one round of the game log; actions are (name, code, value) with codes as in DECODE
+# and value the raise amount or the discarded card
+RecordedRound = namedtuple('RecordedRound', ['number', 'names', 'hands', 'board', 'actions', 'deltas'])
+
+
+def parse_gamelog(path):
+    '''
+    Reads a game log written by the engine.
+
+    Returns:
+        The player names in header order, the deal seed (None for logs written
+        before seeds were recorded) and a list of RecordedRounds
+    '''
+    names = None
+    seed = None
+    rounds = []
+    current = None
+    with open(path) as log_file:
+        for line in log_file:
+            line = line.rstrip('\n')
+            if names is None:
+                match = HEADER.match(line)
+                if match is None:
+                    raise ValueError(path + ' is not an engine game log')
+                names = [match.group(1), match.group(2)]
+                continue
+            match = SEED.match(line)
+            if match is not None:
+                seed = int(match.group(1))
+                continue
+            match = ROUND.match(line)
+            if match is not None:
+                current = RecordedRound(int(match.group(1)), [match.group(2), match.group(4)],
+                                        [None, None], [], [], [None, None])
+                rounds.append(current)
+                continue
+            if current is None:
+                continue
+            match = DEALT.match(line)
+            if match is not None:
+                current.hands[current.names.index(match.group(1))] = match.group(2).split(' ')
+                continue
+            match = BOARD.match(line)
+            if match is not None:
+                current.board[:] = match.group(2).split(' ')
+                continue
+            match = ACTION.match(line)
+            if match is not None and match.group(1) in current.names:
+                name, verb = match.group(1), match.group(2)
+                if verb.startswith('raises') or verb.startswith('bets'):
+                    current.actions.append((name, 'R', int(match.group(3) or match.group(4))))
+                elif verb.startswith('discards'):
+                    current.actions.append((name, 'D', match.group(5)))
+                else:
+                    current.actions.append((name, {'folds': 'F', 'calls': 'C', 'checks': 'K'}[verb], None))
+                continue
+            match = AWARDED.match(line)
+            if match is not None and match.group(1) in current.names:
+                current.deltas[current.names.index(match.group(1))] = int(match.group(2))
+    return names, seed, rounds
+
+
+def runout(board):
+    '''
+    Splits a logged final board into the cards dealt from the deck: the two
+    flop cards, then the turn and river when they were reached.
+    '''
+    if len(board) < 2:
+        return []
+    dealt = board[:2]
+    if len(board) >= 5:
+        dealt += board[4:6]
+    return dealt
+
+
+def recorded_deck(record):
+    '''
+    Rebuilds a round's deck from the cards shown in the log. Cards that were
+    never dealt (a board cut short by a fold) are filled in at random, seeded
+    by the round number so that repeated replays agree.
+    '''
+    from dealing import PresetDeck
+    dealt = record.hands[0] + record.hands[1]
+    board = runout(record.board)
+    rest = [card for card in CARDS if card not in dealt + board]
+    random.Random(record.number).shuffle(rest)
+
+    def fill(count):
+        return [rest.pop() for _ in range(count)]
+
+    # after the hands, the engine deals the flop from deck[0:2], the turn from deck[3] and the river from deck[4]
+    flop, later = board[:2], board[2:]
+    order = dealt + flop + fill(2 - len(flop)) + fill(1) + later + fill(2 - len(later)) + rest
+    return PresetDeck([CARDS[card] for card in order])
+
+
+class RecordedDeals():
+    '''
+    Deals the decks of a recorded game, one round at a time, in place of a
+    DealStream. The seed the log records regenerates the decks exactly;
+    without one they are rebuilt from the logged cards.
+    '''
+
+    def __init__(self, rounds, seed=None):
+        self.rounds = rounds
+        self.stream = None
+        if seed is not None:
+            from dealing import DealStream
+            self.stream = DealStream(seed)
+        self.seed = None  # the replay log should not claim to be a freshly dealt game
+        self.position = 0
+        self.current = None
+
+    def next_deck(self):
+        '''
+        Returns the next round's deck, checking it against the logged hands.
+        '''
+        self.current = self.rounds[self.position]
+        self.position += 1
+        if self.stream is None:
+            return recorded_deck(self.current)
+        deck = self.stream.next_deck()
+        dealt = [str(card) for card in deck.peek(6)]
+        if dealt != self.current.hands[0] + self.current.hands[1]:
+            raise ValueError('round {}: the deal seed does not reproduce the logged hands'.format(self.current.number))
+        return deck
+
+
+def recorded_action(round_state, code, value):
+    '''
+    Converts a logged action into the engine action for round_state, or
+    returns None if it is not legal there.
+    '''
+    action = DECODE[code]
+    if action not in round_state.legal_actions():
+        return None
+    if code == 'R':
+        min_raise, max_raise = round_state.raise_bounds()
+        return RaiseAction(min(max(value, min_raise), max_raise))
+    if code == 'D':
+        hand = [str(card) for card in round_state.hands[round_state.button % 2]]
+        return DiscardAction(hand.index(value) if value in hand else 0)
+    return action()
+
+
+def reconstruct(record, deck):
+    '''
+    Replays one recorded round on the engine's RoundState.
+
+    Returns:
+        A list of (state, action) pairs, each state an independent snapshot
+        taken before the action, followed by the final TerminalState
+    '''
+    hands = [deck.deal(3), deck.deal(3)]
+    round_state = RoundState(0, 0, [SMALL_BLIND, BIG_BLIND], [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND],
+                             hands, deck, [])
+    history = []
+    for name, code, value in record.actions:
+        if isinstance(round_state, TerminalState):
+            raise ValueError('round {}: actions logged after the round ended'.format(record.number))
+        active = round_state.button % 2
+        if record.names[active] != name:
+            raise ValueError('round {}: {} acted out of turn'.format(record.number, name))
+        action = recorded_action(round_state, code, value)
+        if action is None and code == 'F':
+            action = FoldAction()  # the engine's fallback when a check is not legal
+        if action is None:
+            raise ValueError('round {}: {} logged an illegal action'.format(record.number, name))
+        history.append((round_state.copy(), action))
+        round_state = round_state.proceed(action)
+    if not isinstance(round_state, TerminalState):
+        raise ValueError('round {}: the log ends before the round does'.format(record.number))
+    if None not in record.deltas and list(round_state.deltas) != record.deltas:
+        raise ValueError('round {}: replay awards {}, the log awards {}'.format(record.number, round_state.deltas,
+                                                                            record.deltas))
+    history.append(round_state)
+    return history
+
+
+def round_deck(seed, round_number):
+    '''
+    Returns the deck DealStream(seed) deals for round round_number (from 1),
+    for replaying a round from its seed and an action list.
+    '''
+    from dealing import DealStream
+    stream = DealStream(seed)
+    if round_number > 1:
+        stream.next_block(round_number - 1)
+    return stream.next_deck()
+
+
+def load_bot(path):
+    '''
+    Imports the pokerbot in path/player.py into this process.
+
+    Every bot ships its own copy of the skeleton package, so cached skeleton
+    modules, and modules loaded from the bot's directory by an earlier load,
+    are dropped before the bot is imported.
+
+    Returns:
+        The bot's Player instance and its skeleton.runner module
+    '''
+    path = os.path.abspath(path)
+    for name, module in list(sys.modules.items()):
+        if (name == 'skeleton' or name.startswith('skeleton.') or
+                (getattr(module, '__file__', None) or '').startswith(path + os.sep)):
+            del sys.modules[name]
+    sys.path.insert(0, path)
+    try:
+        spec = importlib.util.spec_from_file_location('player', os.path.join(path, 'player.py'))
+        player = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = player
+        spec.loader.exec_module(player)
+        runner = importlib.import_module('skeleton.runner')
+    finally:
+        sys.path.remove(path)
+    return player.Player(), runner
+
+
+class QueueFile():
+    '''
+    One end of an in-process line channel, with the parts of the socket file
+    interface that Player.query and the skeleton's Runner use. Every write is
+    exactly one line.
+    '''
+
+    def __init__(self, incoming, outgoing, timeout=None):
+        self.incoming = incoming
+        self.outgoing = outgoing
+        self.timeout = timeout
+
+    def readline(self):
+        try:
+            return self.incoming.get(timeout=self.timeout)
+        except queue.Empty:
+            raise socket.timeout from None
+
+    def write(self, data):
+        self.outgoing.put(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def channel(timeout=None):
+    '''
+    Returns connected (engine end, bot end) QueueFiles; reads on the engine
+    end time out after timeout seconds like the engine's socket.
+    '''
+    to_bot, to_engine = queue.Queue(), queue.Queue()
+    return QueueFile(to_engine, to_bot, timeout), QueueFile(to_bot, to_engine)
+
+
+class Script():
+    '''
+    Hands out one player's recorded actions, round by round.
+    '''
+
+    def __init__(self, name, deals):
+        self.name = name
+        self.deals = deals
+        self.record = None
+        self.actions = iter(())
+
+    def next_action(self, round_state):
+        '''
+        Returns the player's next recorded action this round if it is legal in
+        round_state. Once the replay has diverged from the log it checks when
+        it can, discards its first card when it must and otherwise folds.
+        '''
+        if self.deals.current is not self.record:
+            self.record = self.deals.current
+            self.actions = iter([(code, value) for name, code, value in self.record.actions if name == self.name])
+        legal_actions = round_state.legal_actions()
+        for code, value in self.actions:
+            action = recorded_action(round_state, code, value)
+            if action is not None:
+                return action
+            break
+        if CheckAction in legal_actions:
+            return CheckAction()
+        return DiscardAction(0) if DiscardAction in legal_actions else FoldAction()
+
+
+class ScriptedPlayer(Player):
+    '''
+    A Player that answers every query with its recorded action.
+    '''
+
+    def __init__(self, name, deals, log_dir='.'):
+        super().__init__(name, None, log_dir)
+        self.script = Script(name, deals)
+        self.usage = BotUsage(None)
+
+    def build(self):
+        pass
+
+    def run(self, verbose=True):
+        pass
+
+    def stop(self):
+        pass
+
+    def query(self, round_state, player_message, game_log):
+        del player_message[1:]
+        if not isinstance(round_state, RoundState):
+            return CheckAction()
+        return self.script.next_action(round_state)
+
+
+class Probe():
+    '''
+    Watches a bot's get_action calls and captures one of them: the decision-th
+    (from 0) call during round round_num.
+    '''
+
+    def __init__(self, round_num, decision, profile=False):
+        self.round_num = round_num
+        self.decision = decision
+        self.profile = profile
+        self.calls = 0
+        self.result = None
+
+    def wrap(self, get_action):
+        def probed_get_action(game_state, round_state, active):
+            if game_state.round_num != self.round_num:
+                return get_action(game_state, round_state, active)
+            self.calls += 1
+            if self.calls - 1 != self.decision:
+                return get_action(game_state, round_state, active)
+            # the skeleton's discards pop cards from the state's lists, so report them as they were
+            snapshot = round_state._replace(hands=[list(hand) for hand in round_state.hands], board=list(round_state.board))
+            profiler = cProfile.Profile() if self.profile else None
+            start_cpu = time.thread_time()
+            start_time = time.perf_counter()
+            if profiler is not None:
+                action = profiler.runcall(get_action, game_state, round_state, active)
+            else:
+                action = get_action(game_state, round_state, active)
+            wall_time = time.perf_counter() - start_time
+            self.result = {
+                'game_state': game_state,
+                'round_state': snapshot,
+                'active': active,
+                'action': action,
+                'wall_time': wall_time,
+                'cpu_time': time.thread_time() - start_cpu,
+                'profiler': profiler,
+            }
+            return action
+        return probed_get_action
+
+
+class InProcessPlayer(Player):
+    '''
+    A Player whose pokerbot runs on a thread of this process, exchanging the
+    engine's messages through a QueueFile channel instead of a socket.
+
+    With a script, the bot sees every message of the recorded game but its
+    answers are replaced by the recorded ones; with a probe, one of its
+    get_action calls is timed and optionally profiled.
+    '''
+
+    def __init__(self, name, path, log_dir='.', script=None, probe=None):
+        super().__init__(name, path, log_dir)
+        self.script = script
+        self.probe = probe
+        self.pokerbot = None
+        self.runner = None
+        self.thread = None
+
+    def build(self):
+        self.pokerbot, self.runner = load_bot(self.path)
+        if self.probe is not None:
+            self.pokerbot.get_action = self.probe.wrap(self.pokerbot.get_action)
+
+    def run(self, verbose=True):
+        engine_end, bot_end = channel(CONNECT_TIMEOUT)
+        self.socketfile = engine_end
+        self.usage = BotUsage(None)
+        runner = self.runner.Runner(self.pokerbot, bot_end)
+
+        def serve():
+            try:
+                runner.run()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                bot_end.write('')  # EOF for the engine
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        if verbose:
+            print(self.name, 'loaded in-process')
+
+    def stop(self):
+        if self.socketfile is not None:
+            self.socketfile.write('Q\n')
+        if self.thread is not None:
+            self.thread.join(CONNECT_TIMEOUT)
+
+    def query(self, round_state, player_message, game_log):
+        action = super().query(round_state, player_message, game_log)
+        if self.script is not None and isinstance(round_state, RoundState):
+            return self.script.next_action(round_state)
+        return action
+
+
+def replay_rounds(game, players, rounds):
+    '''
+    Plays rounds with players seated as the log records them.
+    '''
+    game.seat(players)
+    for player in players:
+        player.build()
+    for player in players:
+        player.run(verbose=False)
+    for record in rounds:
+        seated = sorted(players, key=lambda player: record.names.index(player.name))
+        game.log.append('')
+        game.log.append('Round #' + str(record.number) + STATUS(seated))
+        game.run_round(seated)
+    for player in players:
+        player.stop()
+
+
+def describe(round_state):
+    '''
+    Formats a RoundState for printing.
+    '''
+    return 'street {} button {} pips {} stacks {} board {} hands {} {}'.format(
+        round_state.street, round_state.button, round_state.pips, round_state.stacks, PCARDS(round_state.board),
+        PCARDS(round_state.hands[0]), PCARDS(round_state.hands[1]))
+
+
+def print_round(record, seed):
+    '''
+    Prints the RoundState sequence of one recorded round.
+    '''
+    deck = round_deck(seed, record.number) if seed is not None else recorded_deck(record)
+    history = reconstruct(record, deck)
+    counts = {name: 0 for name in record.names}
+    print('Round #{}: {} (seat 0) vs {} (seat 1)'.format(record.number, *record.names))
+    for round_state, action in history[:-1]:
+        name = record.names[round_state.button % 2]
+        print('  ' + describe(round_state))
+        print('    {} decision {}: {}'.format(name, counts[name], action))
+        counts[name] += 1
+    print('  deltas {}'.format(history[-1].deltas))
+
+
+def query(names, seed, rounds, round_num, name, decision, path, profile):
+    '''
+    Replays the game up to round round_num and re-asks name's bot for its
+    action at one recorded decision.
+    '''
+    if name not in names:
+        raise SystemExit('{} did not play in this game'.format(name))
+    deals = RecordedDeals(rounds, seed)
+    probe = Probe(round_num, decision, profile)
+    players = [InProcessPlayer(name, path, script=Script(name, deals), probe=probe)]
+    players += [ScriptedPlayer(other, deals) for other in names if other != name]
+    game = Game(seed=None)
+    game.deals = deals
+    replay_rounds(game, players, [record for record in rounds if record.number <= round_num])
+    if probe.result is None:
+        raise SystemExit('{} made no decision {} in round {}'.format(name, decision, round_num))
+    result = probe.result
+    record = rounds[[record.number for record in rounds].index(round_num)]
+    recorded = [(code, value) for actor, code, value in record.actions if actor == name][decision]
+    print('Round #{}, {} decision {}'.format(round_num, name, decision))
+    print('  game state: {}'.format(result['game_state']))
+    print('  round state: street {} pips {} stacks {} board {} hand {}'.format(
+        result['round_state'].street, result['round_state'].pips, result['round_state'].stacks,
+        result['round_state'].board, result['round_state'].hands[result['active']]))
+    print('  recorded action: {} {}'.format(*recorded))
+    print('  replayed action: {}'.format(result['action']))
+    print('  time: {:.3f} ms wall, {:.3f} ms cpu'.format(1000 * result['wall_time'], 1000 * result['cpu_time']))
+    if result['profiler'] is not None:
+        stream = io.StringIO()
+        pstats.Stats(result['profiler'], stream=stream).sort_stats('cumulative').print_stats(25)
+        print(stream.getvalue())
+
+
+def rerun(names, seed, rounds, name, path, log_dir):
+    '''
+    Replays the whole game with name's bot playing for real against the
+    opponent's recorded actions, and writes the new game log to log_dir.
+    '''
+    if name not in names:
+        raise SystemExit('{} did not play in this game'.format(name))
+    os.makedirs(log_dir, exist_ok=True)
+    deals = RecordedDeals(rounds, seed)
+    players = [InProcessPlayer(name, path, log_dir)]
+    players += [ScriptedPlayer(other, deals, log_dir) for other in names if other != name]
+    game = Game(log_dir, seed=None)
+    game.deals = deals
+    game.log[0] = '6.9630 MIT Pokerbots - ' + names[0] + ' vs ' + names[1]
+    replay_rounds(game, players, rounds)
+    game.log.append('')
+    game.log.append('Final' + STATUS(players))
+    log_path = os.path.join(log_dir, GAME_LOG_FILENAME + '.txt')
+    with open(log_path, 'w') as log_file:
+        log_file.write('\n'.join(game.log))
+    recorded = sum(record.deltas[record.names.index(name)] for record in rounds)
+    print('{}: recorded {}, replayed {}; log written to {}'.format(name, recorded, players[0].bankroll, log_path))
+
+
+def main():
+    '''Main execution function.'''
+    parser = argparse.ArgumentParser(description='Replays a game from its game log.')
+    parser.add_argument('gamelog', help='game log written by the engine')
+    parser.add_argument('--round', type=int, help='round to reconstruct or query')
+    parser.add_argument('--query', metavar='NAME', help='re-ask NAME\'s bot for one of its decisions in --round')
+    parser.add_argument('--decision', type=int, default=0, help='which of NAME\'s decisions in the round, from 0')
+    parser.add_argument('--rerun', metavar='NAME', help='replay the game with NAME\'s bot playing for real')
+    parser.add_argument('--bot', help='directory of the bot to load in-process')
+    parser.add_argument('--profile', action='store_true', help='profile the queried decision')
+    parser.add_argument('--log-dir', default='replay_logs', help='where --rerun writes its logs')
+    args = parser.parse_args()
+
+    names, seed, rounds = parse_gamelog(args.gamelog)
+    if args.rerun is not None:
+        if args.bot is None:
+            parser.error('--rerun needs --bot')
+        rerun(names, seed, rounds, args.rerun, args.bot, args.log_dir)
+    elif args.query is not None:
+        if args.bot is None or args.round is None:
+            parser.error('--query needs --bot and --round')
+        query(names, seed, rounds, args.round, args.query, args.decision, args.bot, args.profile)
+    elif args.round is not None:
+        record = rounds[[record.number for record in rounds].index(args.round)]
+        print_round(record, seed)
+    else:
+        deals = RecordedDeals(rounds, seed)
+        for record in rounds:
+            reconstruct(record, deals.next_deck())
+        print('All {} rounds replay exactly'.format(len(rounds)))
+
+
+if __name__ == '__main__':
+    main()
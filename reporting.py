@@ -0,0 +1,58 @@
+'''
+Plots of engine results.
+
+matplotlib is only imported when a plot is drawn, so importing the engine
+stays fast and works on hosts without a display.
+'''
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from config import *
+
+HEADLESS_PLOT_FILENAME = 'winnings.png'
+
+
+def headless():
+    '''
+    Returns True if there is no display to show a plot window on.
+    '''
+    if sys.platform in ('win32', 'darwin'):
+        return False
+    return not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def pyplot(output_path=None):
+    '''
+    Imports and returns matplotlib.pyplot, on the Agg backend if the plot
+    is going to a file or there is no display.
+    '''
+    import matplotlib
+    if output_path is not None or headless():
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_winnings(total, output_path=None):
+    '''
+    Plots player 1's average bankroll over the rounds of a game.
+
+    Shows the plot, or saves it to output_path (HEADLESS_PLOT_FILENAME when
+    there is no display).
+    '''
+    if output_path is None and headless():
+        output_path = HEADLESS_PLOT_FILENAME
+    plt = pyplot(output_path)
+    plt.title(f"Player {PLAYER_1_NAME}'s Winnings Against Player {PLAYER_2_NAME}", fontsize=15)
+    plt.xlabel("Number of Rounds", fontsize=15)
+    plt.ylabel("Winnings", fontsize=15)
+    plt.plot([0] * len(total), color='red')
+    plt.xticks(fontsize=15)
+    plt.yticks(fontsize=15)
+    plt.plot(total)
+    if output_path is None:
+        plt.show()
+    else:
+        plt.savefig(output_path, bbox_inches='tight')
+        print('Plot saved to', output_path)
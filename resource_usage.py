@@ -0,0 +1,220 @@
+'''
+Per-bot operating system resource accounting for the game engine.
+
+Wall-clock timing of a query includes time the bot spent waiting for a core,
+which is noisy when many games share one machine. BotUsage reads the bot
+process's own CPU time, memory high-water mark, context switches and page
+faults from /proc/<pid> while it runs and from os.wait4 when it exits.
+
+bot_limits builds the preexec_fn that caps a bot's address space, CPU time
+and open files, and exit_reason explains a bot death caused by those caps.
+'''
+import os
+import time
+import math
+import json
+import signal
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+
+REAP_INTERVAL = 0.01
+
+
+def exit_code(status):
+    '''
+    Converts a raw wait status into a Popen-style return code.
+    '''
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def bot_limits(memory=None, cpu_time=None, open_files=None):
+    '''
+    Returns a preexec_fn applying the given rlimits in the bot subprocess,
+    or None if there is nothing to apply.
+
+    memory is in bytes of address space and cpu_time in seconds. The hard CPU
+    limit is one second above the soft one so the bot gets SIGXCPU first.
+    '''
+    if resource is None or (memory is None and cpu_time is None and open_files is None):
+        return None
+
+    def apply_limits():
+        if memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        if cpu_time is not None:
+            seconds = int(math.ceil(cpu_time))
+            resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+        if open_files is not None:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (open_files, open_files))
+    return apply_limits
+
+
+def exit_reason(returncode, output, memory=None, cpu_time=None, open_files=None):
+    '''
+    Explains a bot exit caused by one of its resource limits.
+
+    output is the tail of the bot's combined stdout/stderr as bytes, and the
+    limits are those given to bot_limits. Returns None if the exit does not
+    look caused by a limit that was set.
+    '''
+    if returncode is None or returncode == 0:
+        return None
+    if cpu_time is not None and returncode == -signal.SIGXCPU:
+        return 'exceeded its CPU time limit'
+    if returncode == -signal.SIGKILL and (memory is not None or cpu_time is not None):
+        limits = ' or '.join(name for name, limit in (('CPU time', cpu_time), ('memory', memory)) if limit is not None)
+        return 'was killed ({} limit)'.format(limits)
+    if memory is not None and b'MemoryError' in output:
+        return 'exceeded its memory limit'
+    if open_files is not None and b'Too many open files' in output:
+        return 'exceeded its open file limit'
+    return None
+
+
+class BotUsage():
+    '''
+    Collects resource usage for one bot subprocess over one game.
+    '''
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.proc_dir = '/proc/{}'.format(pid)
+        self.available = pid is not None and os.path.isdir(self.proc_dir)
+        self.queries = 0
+        self.query_wall_time = 0.
+        self.query_cpu_time = None  # only measured per query when the game clock counts CPU time
+        self.max_query_wall_time = 0.
+        self.sampled = {}
+        self.rusage = None
+
+    def cpu_time(self):
+        '''
+        Returns the user + system CPU seconds used so far by the bot process
+        and its live descendants (e.g. a pokerbot run from a shell script),
+        or None when /proc is unavailable or the process is gone.
+        '''
+        if not self.available:
+            return None
+        total = 0
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            proc_dir = '/proc/{}'.format(pid)
+            try:
+                with open(proc_dir + '/stat', 'rb') as stat_file:
+                    fields = stat_file.read().rsplit(b')', 1)[1].split()
+                for task in os.listdir(proc_dir + '/task'):
+                    with open('{}/task/{}/children'.format(proc_dir, task), 'rb') as children_file:
+                        pending.extend(int(child) for child in children_file.read().split())
+            except OSError:
+                if pid == self.pid:
+                    return None
+                continue  # a descendant exited meanwhile
+            total += int(fields[11]) + int(fields[12])
+        return total / CLOCK_TICKS
+
+    def record_query(self, wall_time, cpu_time):
+        '''
+        Accumulates the cost of one engine query.
+        '''
+        self.queries += 1
+        self.query_wall_time += wall_time
+        self.max_query_wall_time = max(self.max_query_wall_time, wall_time)
+        if cpu_time is not None:
+            self.query_cpu_time = (self.query_cpu_time or 0.) + cpu_time
+
+    def sample(self):
+        '''
+        Snapshots counters from /proc/<pid> while the bot is still alive.
+        '''
+        if not self.available:
+            return
+        try:
+            with open(self.proc_dir + '/stat', 'rb') as stat_file:
+                fields = stat_file.read().rsplit(b')', 1)[1].split()
+            with open(self.proc_dir + '/status', 'r') as status_file:
+                status = dict(line.split(':', 1) for line in status_file if ':' in line)
+        except OSError:
+            return
+        self.sampled = {
+            'user_time': int(fields[11]) / CLOCK_TICKS,
+            'system_time': int(fields[12]) / CLOCK_TICKS,
+            'minor_faults': int(fields[7]),
+            'major_faults': int(fields[9]),
+            'peak_rss_kb': int(status.get('VmHWM', '0 kB').split()[0]),
+            'voluntary_context_switches': int(status.get('voluntary_ctxt_switches', '0')),
+            'involuntary_context_switches': int(status.get('nonvoluntary_ctxt_switches', '0')),
+        }
+
+    def reap(self, proc, timeout):
+        '''
+        Waits up to timeout seconds for proc to exit, recording its rusage.
+
+        On success the return code is stored on proc so that a later
+        Popen.communicate() does not try to reap the process again.
+        Returns True if the process was reaped.
+        '''
+        if not hasattr(os, 'wait4'):
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                pid, status, rusage = os.wait4(proc.pid, 0 if deadline is None else os.WNOHANG)
+            except ChildProcessError:
+                return False
+            if pid == proc.pid:
+                proc.returncode = exit_code(status)
+                self.rusage = rusage
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(REAP_INTERVAL)
+
+    def as_dict(self):
+        '''
+        Returns the collected usage as a JSON-serializable dict.
+        '''
+        usage = {
+            'queries': self.queries,
+            'query_wall_time': round(self.query_wall_time, 6),
+            'max_query_wall_time': round(self.max_query_wall_time, 6),
+        }
+        if self.query_cpu_time is not None:
+            usage['query_cpu_time'] = round(self.query_cpu_time, 6)
+        if self.rusage is not None:
+            # ru_maxrss is reported in kilobytes on Linux
+            usage.update({
+                'user_time': self.rusage.ru_utime,
+                'system_time': self.rusage.ru_stime,
+                'minor_faults': self.rusage.ru_minflt,
+                'major_faults': self.rusage.ru_majflt,
+                'peak_rss_kb': self.rusage.ru_maxrss,
+                'voluntary_context_switches': self.rusage.ru_nvcsw,
+                'involuntary_context_switches': self.rusage.ru_nivcsw,
+                'source': 'wait4',
+            })
+            # ru_maxrss also counts the engine's memory inherited across fork,
+            # whereas VmHWM is reset by exec, so prefer the sampled value
+            if 'peak_rss_kb' in self.sampled:
+                usage['peak_rss_kb'] = self.sampled['peak_rss_kb']
+        elif self.sampled:
+            usage.update(self.sampled)
+            usage['source'] = 'proc'
+        return usage
+
+    def write(self, path):
+        '''
+        Writes the collected usage to path as JSON.
+        '''
+        with open(path, 'w') as usage_file:
+            json.dump(self.as_dict(), usage_file, indent=2)
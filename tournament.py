@@ -0,0 +1,112 @@
+'''
+Runs NUM_GAMES games of the engine in parallel worker processes.
+
+Each worker pins itself to its own set of physical cores before playing, and
+the bots it launches inherit that affinity, so games never compete for the
+same cores and the game clocks only measure each bot's own work.
+'''
+import multiprocessing
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from config import *
+import engine
+from metrics import METRICS, start_server
+from reporting import plot_winnings
+
+TOPOLOGY_PATH = '/sys/devices/system/cpu/cpu{}/topology/'
+
+
+def physical_cores():
+    '''
+    Groups the CPUs this process may run on by physical core.
+
+    Returns a list of sorted lists of logical CPU ids, one per physical core,
+    so that hyperthread siblings always land in the same CPU set.
+    '''
+    if not hasattr(os, 'sched_getaffinity'):
+        return [[cpu] for cpu in range(os.cpu_count() or 1)]
+    cores = {}
+    for cpu in sorted(os.sched_getaffinity(0)):
+        try:
+            with open(TOPOLOGY_PATH.format(cpu) + 'physical_package_id') as package_file:
+                package = package_file.read().strip()
+            with open(TOPOLOGY_PATH.format(cpu) + 'core_id') as core_file:
+                core = core_file.read().strip()
+        except OSError:
+            package, core = 'cpu', str(cpu)
+        cores.setdefault((package, core), []).append(cpu)
+    return sorted(cores.values())
+
+
+def cpu_sets(num_workers):
+    '''
+    Splits the physical cores into num_workers disjoint CPU sets.
+
+    The number of sets is capped to the number of physical cores.
+    '''
+    cores = physical_cores()
+    num_workers = min(num_workers, len(cores)) if num_workers > 0 else len(cores)
+    sets = [[] for _ in range(num_workers)]
+    for i, core in enumerate(cores):
+        sets[i % num_workers].extend(core)
+    return sets
+
+
+def init_worker(cpu_queue, niceness):
+    '''
+    Pins the worker process to the next free CPU set and lowers its priority.
+    '''
+    cpus = cpu_queue.get()
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    if niceness:
+        os.nice(niceness)
+
+
+def play_game(game_index, seed):
+    '''
+    Plays one game, writing its logs to a directory of its own.
+
+    Returns the game's winnings along with the worker's metrics for the game.
+    '''
+    log_dir = os.path.join(TOURNAMENT_LOG_DIR, 'game_{}'.format(game_index + 1))
+    os.makedirs(log_dir, exist_ok=True)
+    METRICS.reset()
+    winnings = engine.Game(log_dir, seed).run(verbose=False)
+    return game_index, winnings, METRICS.snapshot()
+
+
+def play_game_star(args):
+    return play_game(*args)
+
+
+def run_tournament(num_games, num_workers=TOURNAMENT_WORKERS, niceness=TOURNAMENT_NICENESS):
+    '''
+    Plays num_games games across pinned workers.
+
+    Returns player 1's bankroll after each round, averaged over all games.
+    '''
+    sets = cpu_sets(num_workers)
+    cpu_queue = multiprocessing.Queue()
+    for cpus in sets:
+        cpu_queue.put(cpus)
+    if DEAL_SEED is None:
+        seeds = [None] * num_games
+    else:
+        from dealing import game_seeds
+        seeds = game_seeds(DEAL_SEED, num_games)
+    total = [0] * NUM_ROUNDS
+    with multiprocessing.Pool(len(sets), initializer=init_worker, initargs=(cpu_queue, niceness)) as pool:
+        for completed, (game_index, winnings, snapshot) in enumerate(pool.imap_unordered(play_game_star, enumerate(seeds))):
+            total = [running + game_winnings for running, game_winnings in zip(total, winnings)]
+            METRICS.merge(snapshot)
+            print(f"Game {game_index + 1} ({completed + 1}/{num_games})")
+    return [running / num_games for running in total]
+
+
+if __name__ == '__main__':
+    if METRICS_PORT is not None:
+        start_server(METRICS_PORT)
+    plot_winnings(run_tournament(NUM_GAMES), WINNINGS_PLOT_FILENAME)